@@ -0,0 +1,156 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak RSS is then reported as n/a
+    resource = None
+
+from candidate_index import TITLE_ENGINES
+from deduplicate_files import (parse_pubmed, parse_bib, parse_ris, deduplicate,
+                               pubmed_path, wos_path, scopus_path, ris_path)
+from generate_corpus import generate, load_truth
+
+# Speed, memory and accuracy benchmark for the deduplication.
+#
+# Each run parses a corpus from generate_corpus.py with the real parsers,
+# deduplicates it the way deduplicate_files.py does, and scores the keep/drop
+# decisions against corpus_truth.tsv: a record is a true duplicate when its
+# study already appeared earlier in priority order (PubMed, WoS, Scopus, RIS).
+# Every run happens in a fresh process so peak RSS is measured per corpus size.
+
+INPUTS = [(parse_pubmed, pubmed_path, "PubMed"), (parse_bib, wos_path, "WoS"),
+          (parse_bib, scopus_path, "Scopus"), (parse_ris, ris_path, "RIS")]
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / scale
+
+
+def score(parsed, kept, truth):
+    # Record-level precision/recall of the "drop as duplicate" decisions
+    kept_ids = {id(r) for recs in kept for r in recs}
+    seen = set()
+    tp = fp = fn = 0
+    for recs, numbers in zip(parsed, truth):
+        for r, number in zip(recs, numbers):
+            is_duplicate = number in seen
+            seen.add(number)
+            dropped = id(r) not in kept_ids
+            if dropped and is_duplicate:
+                tp += 1
+            elif dropped:
+                fp += 1
+            elif is_duplicate:
+                fn += 1
+    return {
+        'studies': len(seen),
+        'true_duplicates': tp + fn,
+        'dropped': tp + fp,
+        'precision': tp / (tp + fp) if tp + fp else 1.0,
+        'recall': tp / (tp + fn) if tp + fn else 1.0,
+    }
+
+
+def run_benchmark(corpus_dir, title_engine="prefix", workers=1):
+    inputs = [(f, p, label) for f, p, label in INPUTS if os.path.exists(os.path.join(corpus_dir, p))]
+    truth = load_truth(corpus_dir)
+
+    start = time.perf_counter()
+    parsed = [list(parse_func(os.path.join(corpus_dir, path))) for parse_func, path, _ in inputs]
+    parse_time = time.perf_counter() - start
+    records = sum(len(recs) for recs in parsed)
+
+    start = time.perf_counter()
+    kept = deduplicate(parsed, [label for _, _, label in inputs], title_engine, workers)
+    dedup_time = time.perf_counter() - start
+
+    result = {
+        'records': records,
+        'title_engine': title_engine,
+        'workers': workers,
+        'parse_seconds': round(parse_time, 3),
+        'parse_records_per_sec': round(records / parse_time) if parse_time else None,
+        'dedup_seconds': round(dedup_time, 3),
+        'dedup_records_per_sec': round(records / dedup_time) if dedup_time else None,
+        'kept': sum(len(recs) for recs in kept),
+        'peak_rss_mb': None,
+    }
+    result.update(score(parsed, kept, [truth.get(path, []) for _, path, _ in inputs]))
+    rss = peak_rss_mb()
+    result['peak_rss_mb'] = round(rss, 1) if rss is not None else None
+    return result
+
+
+def benchmark_size(records, title_engine, workers, corpus_options, keep_dir=None):
+    if keep_dir:
+        corpus_dir = os.path.join(keep_dir, f"corpus_{records}")
+        generate(corpus_dir, records, **corpus_options)
+        return run_benchmark(corpus_dir, title_engine, workers)
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        generate(corpus_dir, records, **corpus_options)
+        return run_benchmark(corpus_dir, title_engine, workers)
+
+
+def print_result(r):
+    rss = f"{r['peak_rss_mb']:.1f} MB" if r['peak_rss_mb'] is not None else "n/a"
+    print(f"\n{r['records']} records ({r['studies']} studies, {r['true_duplicates']} true duplicates), "
+          f"engine={r['title_engine']}, workers={r['workers']}")
+    print(f"  Parse:  {r['parse_seconds']:.2f} s ({r['parse_records_per_sec']} records/sec)")
+    print(f"  Dedup:  {r['dedup_seconds']:.2f} s ({r['dedup_records_per_sec']} records/sec)")
+    print(f"  Peak RSS: {rss}")
+    print(f"  Kept {r['kept']}, dropped {r['dropped']}: "
+          f"precision {r['precision']:.4f}, recall {r['recall']:.4f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark deduplication speed, memory and accuracy")
+    parser.add_argument("--records", type=int, nargs='+', default=[1000, 10000],
+                        help="Corpus sizes to generate and benchmark (e.g. 1000 10000 100000 1000000)")
+    parser.add_argument("--corpus", default=None,
+                        help="Benchmark an existing generate_corpus.py directory instead")
+    parser.add_argument("--keep-corpus", default=None,
+                        help="Write the generated corpora under this directory instead of a temp dir")
+    parser.add_argument("--title-engine", choices=TITLE_ENGINES, default="prefix")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--dup-rate", type=float, default=0.3)
+    parser.add_argument("--typo-rate", type=float, default=0.3)
+    parser.add_argument("--missing-doi", type=float, default=0.2)
+    parser.add_argument("--cross-format", type=float, default=0.7)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    corpus_options = {'dup_rate': args.dup_rate, 'typo_rate': args.typo_rate,
+                      'missing_doi': args.missing_doi, 'cross_format': args.cross_format,
+                      'seed': args.seed}
+    results = []
+    sizes = [None] if args.corpus else args.records
+    for size in sizes:
+        # A fresh process per run keeps the peak RSS figures independent
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            if size is None:
+                future = pool.submit(run_benchmark, args.corpus, args.title_engine, args.workers)
+            else:
+                future = pool.submit(benchmark_size, size, args.title_engine, args.workers,
+                                     corpus_options, args.keep_corpus)
+            result = future.result()
+        print_result(result)
+        results.append(result)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
@@ -0,0 +1,192 @@
+import re
+
+# Single-pass BibTeX tokenizer, shared by the deduplication and screening agents.
+#
+# Entries are read left to right: the header (@type{key,), then each
+# name = value field, where a value is a {braced} or "quoted" string (nested
+# braces are tracked by depth), a bare number/macro, or several of them joined
+# with #. Scanning jumps between braces and quotes with regexes, so every
+# byte of the file is looked at once. Works on str and on bytes (e.g. an mmap);
+# field values come back in the same type, field names as lowercase str.
+#
+# Any entry type is accepted (@article, @Article, @inproceedings, ...);
+# @comment, @string and @preamble are skipped. A malformed entry (unbalanced
+# braces, missing '=') ends at the next line that starts with '@', so one bad
+# entry never swallows the rest of the file.
+
+NON_RECORD_ENTRIES = {'comment', 'string', 'preamble'}
+
+
+class BibEntry:
+    __slots__ = ('type', 'key', 'fields', 'start', 'end')
+
+    def __init__(self, entry_type, key, fields, start, end):
+        self.type = entry_type
+        self.key = key
+        self.fields = fields
+        self.start = start
+        self.end = end
+
+    def get(self, name, default=None):
+        return self.fields.get(name, default)
+
+
+class _Syntax:
+    # The same grammar compiled for str or bytes input
+    def __init__(self, as_bytes):
+        def c(pattern):
+            return re.compile(pattern.encode('ascii') if as_bytes else pattern)
+
+        self.as_bytes = as_bytes
+        # Non-ASCII bytes may be word characters; the decoded type is re-checked
+        self.header = c(r'@[ \t]*((?:\w|[\x80-\xff])+)\s*([{(])' if as_bytes else r'@[ \t]*(\w+)\s*([{(])')
+        self.key = c(r'\s*([^\s,{}()]*)\s*')
+        self.field = c(r'[\s,]*([^\s=,{}()"#]+)\s*=\s*')
+        # Fast path for the common name = {value without nested braces} field
+        self.simple_field = c(r'[\s,]*([^\s=,{}()"#]+)\s*=\s*\{([^{}]*)\}(?=\s*[,})])')
+        self.close = c(r'[\s,]*([})])')
+        self.braces = c(r'[{}]')
+        self.quoted = c(r'[{}"]')
+        self.bare = c(r'[^\s,{}()"#]+')
+        self.concat = c(r'\s*#\s*')
+        self.next_line_entry = c(r'\n[ \t]*@')
+        self.open_brace, self.close_brace, self.quote = (b'{', b'}', b'"') if as_bytes else ('{', '}', '"')
+        self.empty = b'' if as_bytes else ''
+        self.names = {}
+
+    def text(self, value):
+        return value.decode('utf-8', errors='replace') if self.as_bytes else value
+
+    def name(self, value):
+        # Field names repeat in every entry, so decode and lowercase each one once
+        name = self.names.get(value)
+        if name is None:
+            name = self.names[value] = self.text(value).lower()
+        return name
+
+
+_STR = _Syntax(False)
+_BYTES = _Syntax(True)
+_WORD = re.compile(r'\w+$')
+
+
+def _match_braces(syn, data, pos, limit):
+    # pos is at '{'; returns the index just past its matching '}', or None
+    depth = 0
+    for m in syn.braces.finditer(data, pos, limit):
+        if m.group() == syn.open_brace:
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return m.end()
+    return None
+
+
+def _match_quotes(syn, data, pos, limit):
+    # pos is at '"'; a quote only ends the value outside nested braces
+    depth = 0
+    for m in syn.quoted.finditer(data, pos + 1, limit):
+        token = m.group()
+        if token == syn.open_brace:
+            depth += 1
+        elif token == syn.close_brace:
+            depth -= 1
+        elif depth <= 0:
+            return m.end()
+    return None
+
+
+def _read_value(syn, data, pos, limit):
+    # Returns (value, end) or (None, pos) if no value could be read
+    parts = []
+    while True:
+        ch = data[pos:pos + 1]
+        if ch == syn.open_brace:
+            end = _match_braces(syn, data, pos, limit)
+            if end is None:
+                return None, pos
+            parts.append(data[pos + 1:end - 1])
+        elif ch == syn.quote:
+            end = _match_quotes(syn, data, pos, limit)
+            if end is None:
+                return None, pos
+            parts.append(data[pos + 1:end - 1])
+        else:
+            m = syn.bare.match(data, pos, limit)
+            if not m:
+                return None, pos
+            end = m.end()
+            parts.append(m.group())
+        pos = end
+        m = syn.concat.match(data, pos, limit)
+        if not m:
+            return syn.empty.join(parts), pos
+        pos = m.end()
+
+
+def _read_fields(syn, data, pos, limit, closer, fields):
+    # Fills fields; returns the index just past the closing brace, or None if malformed
+    while True:
+        m = syn.simple_field.match(data, pos, limit)
+        if m:
+            fields.setdefault(syn.name(m.group(1)), m.group(2))
+            pos = m.end()
+            continue
+        m = syn.close.match(data, pos, limit)
+        if m:
+            return m.end() if syn.text(m.group(1)) == closer else None
+        m = syn.field.match(data, pos, limit)
+        if not m:
+            return None
+        name = syn.name(m.group(1))
+        value, pos = _read_value(syn, data, m.end(), limit)
+        if value is None:
+            return None
+        # The first occurrence of a repeated field wins
+        fields.setdefault(name, value)
+
+
+def iter_entries(data, start=0, end=None):
+    # Yields a BibEntry for every record entry in data[start:end]
+    syn = _STR if isinstance(data, str) else _BYTES
+    limit = len(data) if end is None else end
+    pos = start
+    while True:
+        m = syn.header.search(data, pos, limit)
+        if not m:
+            return
+        entry_type = syn.text(m.group(1))
+        if not _WORD.match(entry_type):
+            # Non-word, non-ASCII character in the entry type: keep scanning after the '@'
+            pos = m.start() + 1
+            continue
+        closer = '}' if syn.text(m.group(2)) == '{' else ')'
+
+        if entry_type.lower() in NON_RECORD_ENTRIES:
+            if m.group(2) == syn.open_brace:
+                skip = _match_braces(syn, data, m.end() - 1, limit)
+            else:
+                skip = data.find(b')' if syn.as_bytes else ')', m.end(), limit) + 1 or None
+            pos = skip if skip else m.end()
+            continue
+
+        k = syn.key.match(data, m.end(), limit)
+        key = syn.text(k.group(1))
+        fields = {}
+        after = k.end()
+        if data[after:after + 1] == (b',' if syn.as_bytes else ','):
+            after += 1
+        entry_end = _read_fields(syn, data, after, limit, closer, fields)
+        if entry_end is None:
+            # Malformed: the entry runs up to the next line starting with '@'
+            nxt = syn.next_line_entry.search(data, m.end(), limit)
+            entry_end = nxt.start() if nxt else limit
+        yield BibEntry(entry_type, key, fields, m.start(), entry_end)
+        pos = entry_end
+
+
+def clean_value(value):
+    # Field value as one line of text without grouping braces
+    text = " ".join(line.strip() for line in value.split('\n'))
+    return re.sub(r'[{}]', '', text)
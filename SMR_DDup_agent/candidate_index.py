@@ -0,0 +1,304 @@
+import re
+import difflib
+from bisect import bisect_left
+from itertools import islice
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+from minhash_lsh import MinHashLSH
+
+# Candidate generation for Record.is_duplicate_of.
+#
+# Exact keys (DOI, PMID, normalized title) are plain hash maps. Fuzzy title
+# candidates come from a q-gram prefix filter: a pair whose difflib ratio
+# reaches a threshold must share a minimum number of character 3-grams, so
+# indexing only the rarest grams of each title ("token prefix") is enough to
+# surface every pair that could pass the 0.90/0.95 rules. The filter never
+# drops a true match, so duplicate decisions are identical to an all-pairs scan.
+# The "minhash" engine (minhash_lsh.py) is a faster, probabilistic alternative.
+
+GRAM_SIZE = 3
+FUZZY_THRESHOLD = 0.95
+SAME_YEAR_THRESHOLD = 0.90
+
+
+def normalize_text(text):
+    if not text:
+        return ""
+    # Remove non-alphanumeric characters and lowercase
+    return re.sub(r'[^a-zA-Z0-9]', '', text).lower()
+
+
+def title_similarity(a, b):
+    if not a or not b: return 0
+    # Quick length check
+    if abs(len(a) - len(b)) > max(len(a), len(b)) * 0.2:
+        return 0
+    return difflib.SequenceMatcher(None, a.lower(), b.lower()).ratio()
+
+
+def title_grams(title):
+    s = title.lower()
+    return [s[i:i + GRAM_SIZE] for i in range(len(s) - GRAM_SIZE + 1)]
+
+
+def gram_frequencies(records):
+    # Document frequency of each gram, used to put rare grams first in the prefix
+    freq = Counter()
+    for r in records:
+        if r.title:
+            freq.update(set(title_grams(r.title)))
+    return freq
+
+
+def ids_below(ids, below):
+    # ids is ascending (ids are added in order); only those < below, or all if below is None
+    return ids if below is None else islice(ids, bisect_left(ids, below))
+
+
+@lru_cache(maxsize=None)
+def min_matches(total, threshold):
+    # Smallest matched-character count M with difflib's 2.0 * M / total >= threshold
+    m = int(threshold * total / 2)
+    while m > 0 and 2.0 * (m - 1) / total >= threshold:
+        m -= 1
+    while 2.0 * m / total < threshold:
+        m += 1
+    return m
+
+
+@lru_cache(maxsize=None)
+def min_shared_grams(la, lb, threshold):
+    # Lower bound on shared 3-grams for two strings of these lengths whose ratio
+    # reaches threshold, or None if the lengths alone rule the pair out.
+    m = min_matches(la + lb, threshold)
+    if m > min(la, lb):
+        return None
+    # Every unmatched character (and every gap between matching blocks) destroys
+    # at most GRAM_SIZE grams of the other string.
+    edits = la + lb - 2 * m
+    return max(la, lb) - GRAM_SIZE + 1 - GRAM_SIZE * edits
+
+
+@lru_cache(maxsize=None)
+def prefix_overlap(length, threshold):
+    # Shared-gram bound that holds for any partner length of a title this long
+    bounds = []
+    lb = 1
+    while 2.0 * length / (length + lb) >= threshold or lb <= length:
+        bound = min_shared_grams(length, lb, threshold)
+        if bound is not None:
+            bounds.append(bound)
+        lb += 1
+    return min(bounds) if bounds else 0
+
+
+class _PrefixTier:
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.postings = defaultdict(list)
+        self.unfiltered = []
+        self.members = []
+
+    def prefix(self, tokens, length):
+        overlap = prefix_overlap(length, self.threshold)
+        if overlap < 1:
+            return None
+        return tokens[:len(tokens) - overlap + 1]
+
+    def add(self, rid, tokens, length):
+        self.members.append(rid)
+        prefix = self.prefix(tokens, length)
+        if prefix is None:
+            self.unfiltered.append(rid)
+            return
+        for tok in prefix:
+            self.postings[tok].append(rid)
+
+    def probe(self, tokens, length, found, below=None):
+        prefix = self.prefix(tokens, length)
+        if prefix is None:
+            found.update(ids_below(self.members, below))
+            return
+        found.update(ids_below(self.unfiltered, below))
+        for tok in prefix:
+            ids = self.postings.get(tok)
+            if ids:
+                found.update(ids_below(ids, below))
+
+
+class PrefixBlocker:
+    # Exact fuzzy-title blocking: a global 0.95 tier plus one 0.90 tier per year
+    def __init__(self, gram_freq=None):
+        self.gram_freq = gram_freq or {}
+        self.all_years = _PrefixTier(FUZZY_THRESHOLD)
+        self.by_year = {}
+
+    def _tokens(self, title):
+        # Multiset grams as (gram, occurrence) tokens in a fixed rare-first order
+        tokens = []
+        for gram, count in Counter(title_grams(title)).items():
+            tokens.extend((gram, k) for k in range(count))
+        freq = self.gram_freq
+        tokens.sort(key=lambda t: (freq.get(t[0], 0), t))
+        return tokens
+
+    def add(self, rid, record, sig=None):
+        tokens = self._tokens(record.title)
+        length = len(record.title.lower())
+        self.all_years.add(rid, tokens, length)
+        if record.year:
+            tier = self.by_year.get(record.year)
+            if tier is None:
+                tier = self.by_year[record.year] = _PrefixTier(SAME_YEAR_THRESHOLD)
+            tier.add(rid, tokens, length)
+
+    def candidates(self, record, below=None):
+        found = set()
+        tokens = self._tokens(record.title)
+        length = len(record.title.lower())
+        self.all_years.probe(tokens, length, found, below)
+        if record.year and record.year in self.by_year:
+            self.by_year[record.year].probe(tokens, length, found, below)
+        return found
+
+
+TITLE_ENGINES = ("prefix", "minhash", "tfidf")
+
+
+def make_blocker(title_engine, gram_freq=None, corpus=None):
+    if title_engine == "prefix":
+        return PrefixBlocker(gram_freq)
+    if title_engine == "minhash":
+        return MinHashLSH()
+    if title_engine == "tfidf":
+        # Optional numpy/scipy dependency, only imported when selected
+        from tfidf_matcher import TfidfTitleMatcher
+        return TfidfTitleMatcher(corpus or [])
+    raise ValueError(f"Unknown title engine: {title_engine}")
+
+
+class CandidateIndex:
+    # keep_all=True keeps every record id per DOI/PMID/title key, which
+    # earlier_matches needs when the index holds all records, not just kept ones.
+    # corpus: every record that will be queried or added (needed by the batch tfidf engine)
+    def __init__(self, gram_freq=None, title_engine="prefix", keep_all=False, corpus=None):
+        self.records = []
+        self.keep_all = keep_all
+        self.by_doi = {}
+        self.by_pmid = {}
+        self.by_title = {}
+        self.blocker = make_blocker(title_engine, gram_freq, corpus)
+        # Engines that score titles themselves; None means difflib's title_similarity
+        self.similarity = getattr(self.blocker, 'similarity', None)
+
+    def __len__(self):
+        return len(self.records)
+
+    def _add_key(self, key_map, key, rid):
+        if self.keep_all:
+            key_map.setdefault(key, []).append(rid)
+        else:
+            key_map.setdefault(key, rid)
+
+    def _key_ids(self, key_map, key):
+        if not key or key not in key_map:
+            return []
+        ids = key_map[key]
+        return ids if self.keep_all else [ids]
+
+    def add(self, record, sig=None):
+        # sig: a precomputed title signature (MinHash engine), e.g. from dedup_store
+        rid = len(self.records)
+        self.records.append(record)
+        if record.doi:
+            self._add_key(self.by_doi, record.doi, rid)
+        if record.pmid:
+            self._add_key(self.by_pmid, record.pmid, rid)
+        if record.normalized_title:
+            self._add_key(self.by_title, record.normalized_title, rid)
+        if record.title:
+            self.blocker.add(rid, record, sig)
+        return rid
+
+    def fuzzy_candidates(self, record, below=None):
+        # below: only ids smaller than this (the records added before it)
+        if not record.title:
+            return set()
+        return self.blocker.candidates(record, below)
+
+    def _may_match(self, record, grams, other):
+        # Cheap checks that only reject pairs is_duplicate_of would also reject
+        if not other.title or abs(len(record.title) - len(other.title)) >= 20:
+            return False
+        if self.similarity is not None:
+            # The q-gram bound below only holds for difflib scores
+            return True
+        threshold = FUZZY_THRESHOLD
+        if record.year and other.year and record.year == other.year:
+            threshold = SAME_YEAR_THRESHOLD
+        la, lb = len(record.title.lower()), len(other.title.lower())
+        needed = min_shared_grams(la, lb, threshold)
+        if needed is None:
+            return False
+        if needed < 1:
+            return True
+        shared = grams & Counter(title_grams(other.title))
+        return sum(shared.values()) >= needed
+
+    def exact_ids(self, record):
+        return (self._key_ids(self.by_doi, record.doi) +
+                self._key_ids(self.by_pmid, record.pmid) +
+                self._key_ids(self.by_title, record.normalized_title))
+
+    def find_duplicate(self, record):
+        # Returns an indexed record that record duplicates, or None
+        exact = self.exact_ids(record)
+        if exact:
+            return self.records[exact[0]]
+
+        candidates = self.fuzzy_candidates(record)
+        if not candidates:
+            return None
+        grams = Counter(title_grams(record.title))
+        for rid in sorted(candidates):
+            other = self.records[rid]
+            if self._may_match(record, grams, other) and record.is_duplicate_of(other, self.similarity):
+                return other
+        return None
+
+    def earlier_matches(self, rid):
+        # (id, rule, score) for every record added before rid that rid duplicates
+        record = self.records[rid]
+        found = {}
+        for j in self.exact_ids(record):
+            if j < rid and j not in found:
+                found[j] = record.match_rule(self.records[j], self.similarity)
+        candidates = self.fuzzy_candidates(record, below=rid)
+        if candidates:
+            grams = Counter(title_grams(record.title))
+            for j in candidates:
+                if j < rid and j not in found:
+                    other = self.records[j]
+                    if self._may_match(record, grams, other):
+                        match = record.match_rule(other, self.similarity)
+                        if match:
+                            found[j] = match
+        return [(j,) + found[j] for j in sorted(found)]
+
+    def first_earlier_match(self, rid, after=-1, among=None):
+        # Smallest id j with after < j < rid that rid duplicates, or None.
+        # among: only consider these ids (e.g. the records kept so far)
+        record = self.records[rid]
+        exact = set(self.exact_ids(record))
+        ids = exact | self.fuzzy_candidates(record, below=rid)
+        grams = None
+        for j in sorted(j for j in ids if after < j < rid and (among is None or j in among)):
+            if j in exact:
+                return j
+            other = self.records[j]
+            if grams is None:
+                grams = Counter(title_grams(record.title))
+            if self._may_match(record, grams, other) and record.match_rule(other, self.similarity):
+                return j
+        return None
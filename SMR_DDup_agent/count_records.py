@@ -1,38 +1,53 @@
-import re
 import os
+import argparse
 
-def count_pubmed(filename):
-    if not os.path.exists(filename): return 0
-    with open(filename, 'r', encoding='utf-8') as f:
-        content = f.read()
-        return len(re.findall(r'^PMID- ', content, re.MULTILINE))
+from record_counter import CHUNK_SIZE, count_files
 
-def count_bib(filename):
-    if not os.path.exists(filename): return 0
-    with open(filename, 'r', encoding='utf-8') as f:
-        content = f.read()
-        return len(re.findall(r'@(?:article|ARTICLE|inproceedings|BOOK|book|phdthesis|mastersthesis|techreport|misc)\{', content))
+# Configuration: Update these to match your filenames
+# (label, input export, deduplicated output)
+SOURCES = [
+    ('PubMed', 'pubmed_input.txt', 'pubmed_deduplicated.txt'),
+    ('Web of Science', 'wos_input.bib', 'wos_deduplicated.bib'),
+    ('Scopus', 'scopus_input.bib', 'scopus_deduplicated.bib'),
+    ('RIS', 'articles.ris', 'ris_deduplicated.ris'),
+]
 
-def count_ris(filename):
-    if not os.path.exists(filename): return 0
-    with open(filename, 'r', encoding='utf-8') as f:
-        content = f.read()
-        return len(re.findall(r'\nER\s+-', content))
+def report(workers=1, chunk_size=CHUNK_SIZE, inputs=True, deduplicated=True):
+    # Counts every existing input and deduplicated file in one pass (in parallel)
+    paths = []
+    for _, input_file, clean_file in SOURCES:
+        if inputs: paths.append(input_file)
+        if deduplicated: paths.append(clean_file)
+    counts = count_files([p for p in paths if os.path.exists(p)], workers, chunk_size)
 
-# Configuration: Update these to match your filenames
-pubmed_file = 'pubmed_input.txt'
-wos_file = 'wos_input.bib'
-scopus_file = 'scopus_input.bib'
-ris_file = 'articles.ris'
+    rows = []
+    for label, input_file, clean_file in SOURCES:
+        n_in = counts.get(input_file) if inputs else None
+        n_out = counts.get(clean_file) if deduplicated else None
+        if n_in is not None or n_out is not None:
+            rows.append((label, n_in, n_out))
+    return rows
 
-counts = {}
-if os.path.exists(pubmed_file): counts['PubMed'] = count_pubmed(pubmed_file)
-if os.path.exists(wos_file): counts['Web of Science'] = count_bib(wos_file)
-if os.path.exists(scopus_file): counts['Scopus'] = count_bib(scopus_file)
-if os.path.exists(ris_file): counts['RIS'] = count_ris(ris_file)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Count records in the input and deduplicated files")
+    parser.add_argument("files", nargs="*",
+                        help="Count these files instead (format from the extension: .txt/.nbib, .bib, .ris)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Count up to N files in parallel")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help="Bytes read per chunk")
+    args = parser.parse_args()
 
-if not counts:
-    print("No input files found to count.")
-else:
-    for label, count in counts.items():
-        print(f"{label}: {count} records")
+    if args.files:
+        for path, count in count_files(args.files, args.workers, args.chunk_size).items():
+            print(f"{path}: {count} records")
+    else:
+        rows = report(args.workers, args.chunk_size)
+        if not rows:
+            print("No input files found to count.")
+        else:
+            print(f"{'Source':<16}{'Input':>10}{'Deduplicated':>14}{'Removed':>10}")
+            for label, n_in, n_out in rows:
+                removed = n_in - n_out if n_in is not None and n_out is not None else None
+                cells = ["-" if n is None else str(n) for n in (n_in, n_out, removed)]
+                print(f"{label:<16}{cells[0]:>10}{cells[1]:>14}{cells[2]:>10}")
@@ -0,0 +1,106 @@
+import csv
+import json
+
+from parallel_dedup import find_matches
+
+# Duplicate clustering.
+#
+# Every matched pair (found once by find_matches) is merged into a union-find
+# structure, so duplicates form clusters regardless of the order in which the
+# pairs were seen. Each cluster keeps one representative: the member that comes
+# first in priority order (stored records, then PubMed, WoS, Scopus, RIS).
+# The audit report lists every cluster with the rule behind each link.
+
+CLUSTER_CSV = "dedup_clusters.csv"
+CLUSTER_JSON = "dedup_clusters.json"
+
+
+class UnionFind:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, i):
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+        # Path compression
+        while self.parent[i] != root:
+            self.parent[i], i = root, self.parent[i]
+        return root
+
+    def union(self, a, b):
+        # The smaller id stays root, so a cluster's root is its first member
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return ra
+        if rb < ra:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        return ra
+
+
+def build_clusters(matches):
+    # matches[i]: (j, rule, score) for each earlier record j that record i duplicates
+    # Returns (roots, clusters): roots[i] is record i's representative,
+    # clusters maps each representative to its member ids (only clusters of 2+)
+    uf = UnionFind(len(matches))
+    for i, earlier in enumerate(matches):
+        for j, _, _ in earlier:
+            uf.union(i, j)
+    roots = [uf.find(i) for i in range(len(matches))]
+    clusters = {}
+    for i, root in enumerate(roots):
+        clusters.setdefault(root, []).append(i)
+    return roots, {root: members for root, members in clusters.items() if len(members) > 1}
+
+
+def cluster_records(file_records, labels, workers=1, title_engine="prefix",
+                    csv_path=CLUSTER_CSV, json_path=CLUSTER_JSON):
+    # file_records: one record list per source, in priority order
+    # Returns the per-source lists of cluster representatives (and singletons)
+    records = [r for recs in file_records for r in recs]
+    sources = [label for recs, label in zip(file_records, labels) for _ in recs]
+    print(f"Clustering {len(records)} records...")
+    matches = find_matches(records, workers, title_engine)
+    roots, clusters = build_clusters(matches)
+    write_cluster_report(records, sources, matches, clusters, csv_path, json_path)
+    print(f"{len(clusters)} duplicate clusters "
+          f"({sum(len(m) for m in clusters.values()) - len(clusters)} records merged) "
+          f"-> {csv_path}, {json_path}")
+
+    results = []
+    offset = 0
+    for recs in file_records:
+        results.append([r for i, r in enumerate(recs, offset) if roots[i] == i])
+        offset += len(recs)
+    return results
+
+
+def write_cluster_report(records, sources, matches, clusters, csv_path, json_path):
+    # One pass over the clusters writes both the CSV and the JSON audit
+    report = []
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Cluster", "Role", "Source", "Index", "PMID", "DOI", "Year",
+                         "Title", "Matched To", "Rule", "Score"])
+        for number, root in enumerate(sorted(clusters), 1):
+            members = []
+            for i in clusters[root]:
+                r = records[i]
+                links = [{'to': j, 'rule': rule, 'score': round(score, 4)} for j, rule, score in matches[i]]
+                role = "representative" if i == root else "duplicate"
+                members.append({
+                    'index': i, 'role': role, 'source': sources[i],
+                    'pmid': r.pmid, 'doi': r.doi, 'year': r.year, 'title': r.title,
+                    'matches': links,
+                })
+                # Records linked to several earlier members list them all, ";"-separated
+                writer.writerow([number, role, sources[i], i, r.pmid or '', r.doi or '',
+                                 r.year or '', r.title,
+                                 ";".join(str(l['to']) for l in links),
+                                 ";".join(l['rule'] for l in links),
+                                 ";".join(str(l['score']) for l in links)])
+            report.append({'cluster': number, 'representative': root, 'members': members})
+
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump({'records': len(records), 'clusters': report}, f, indent=2, ensure_ascii=False)
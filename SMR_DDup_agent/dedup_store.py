@@ -0,0 +1,74 @@
+import hashlib
+import sqlite3
+from array import array
+
+# On-disk index of the records kept by earlier runs, for incremental updates.
+#
+# records holds the match keys of every kept record (DOI, PMID, normalized
+# title, year, plus the MinHash signature when that engine is used); seen holds
+# a content hash of every input record already processed, kept or dropped, so
+# a rerun on an updated export only compares the new records.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY,
+    source TEXT,
+    doi TEXT,
+    pmid TEXT,
+    normalized_title TEXT,
+    title TEXT,
+    year TEXT,
+    signature BLOB
+);
+CREATE INDEX IF NOT EXISTS records_doi ON records (doi);
+CREATE INDEX IF NOT EXISTS records_pmid ON records (pmid);
+CREATE INDEX IF NOT EXISTS records_title ON records (normalized_title);
+CREATE TABLE IF NOT EXISTS seen (content_hash TEXT PRIMARY KEY);
+"""
+
+
+def content_hash(text):
+    return hashlib.sha1(text.strip().encode('utf-8')).hexdigest()
+
+
+class DedupStore:
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def is_empty(self):
+        return self.conn.execute("SELECT 1 FROM records LIMIT 1").fetchone() is None
+
+    def load(self, make_record):
+        # Yields (record, signature) in the order the records were kept
+        rows = self.conn.execute(
+            "SELECT doi, pmid, title, year, signature FROM records ORDER BY id")
+        for doi, pmid, title, year, sig in rows:
+            record = make_record(source_file=self.path, doi=doi, pmid=pmid, title=title, year=year)
+            if sig is not None:
+                sig = array('I', sig).tolist()
+            yield record, sig
+
+    def seen_hashes(self):
+        return {h for (h,) in self.conn.execute("SELECT content_hash FROM seen")}
+
+    def add(self, records, source, signatures=None):
+        if signatures is None:
+            signatures = [None] * len(records)
+        self.conn.executemany(
+            "INSERT INTO records (source, doi, pmid, normalized_title, title, year, signature) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(source, r.doi, r.pmid, r.normalized_title, r.title, r.year,
+              array('I', sig).tobytes() if sig is not None else None)
+             for r, sig in zip(records, signatures)])
+
+    def mark_seen(self, hashes):
+        self.conn.executemany("INSERT OR IGNORE INTO seen (content_hash) VALUES (?)",
+                              [(h,) for h in hashes])
+
+    def commit(self):
+        self.conn.commit()
@@ -1,169 +1,225 @@
 import re
-import difflib
 import os
+import sys
+import mmap
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, contextmanager
+from candidate_index import CandidateIndex, TITLE_ENGINES, gram_frequencies, normalize_text, title_similarity
+from parallel_dedup import deduplicate_parallel, use_workers
+from dedup_clusters import cluster_records
+from dedup_store import DedupStore, content_hash
+from minhash_lsh import signature
+from bibtex_tokenizer import iter_entries, clean_value
 
-def normalize_text(text):
-    if not text:
-        return ""
-    # Remove non-alphanumeric characters and lowercase
-    return re.sub(r'[^a-zA-Z0-9]', '', text).lower()
+@contextmanager
+def map_file(filename):
+    # Read-only memory map of the whole file (mmap cannot map empty files)
+    with open(filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mm
+        finally:
+            mm.close()
 
-def title_similarity(a, b):
-    if not a or not b: return 0
-    # Quick length check
-    if abs(len(a) - len(b)) > max(len(a), len(b)) * 0.2:
-        return 0
-    return difflib.SequenceMatcher(None, a.lower(), b.lower()).ratio()
+def decode_block(raw):
+    # Same text the old f.read() in text mode produced (universal newlines)
+    return raw.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+
+def strip_span(raw, start, end, right=True):
+    # Byte offsets of raw.strip() (or raw.lstrip()) within the mapped file
+    text = raw.decode('utf-8')
+    lead = len(text) - len(text.lstrip())
+    start += len(text[:lead].encode('utf-8'))
+    if right:
+        trail = len(text) - len(text.rstrip())
+        if trail:
+            end -= len(text[-trail:].encode('utf-8'))
+    return start, end
 
 class Record:
-    def __init__(self, source_file, original_text, pmid=None, doi=None, title=None, authors=None, year=None):
-        self.source_file = source_file
-        self.original_text = original_text
+    # Slots and interned source/year strings keep a parsed record to its match keys
+    # plus byte offsets; the text and author list are read back from the file on demand.
+    __slots__ = ('source_file', '_original_text', 'start', 'end', 'fmt', 'pmid', 'doi',
+                 'title', 'normalized_title', '_authors', 'year')
+
+    def __init__(self, source_file, original_text=None, pmid=None, doi=None, title=None, authors=None, year=None, span=None, fmt=None):
+        self.source_file = sys.intern(source_file)
+        # Parsed records keep (start, end) byte offsets into source_file instead of the text
+        self._original_text = original_text
+        self.start, self.end = span if span is not None else (-1, -1)
+        self.fmt = fmt # 'pubmed', 'bib' or 'ris' for parsed records
         self.pmid = pmid
         self.doi = doi.lower() if doi else None
         self.title = title.strip() if title else ""
         self.normalized_title = normalize_text(self.title)
-        self.authors = authors # List of strings
-        self.year = str(year) if year else None
+        self._authors = authors # List of strings
+        self.year = sys.intern(str(year)) if year else None
 
-    def is_duplicate_of(self, other):
-        # 1. DOI Match
-        if self.doi and other.doi and self.doi == other.doi:
-            return True
-        
-        # 2. PMID Match (if both are PubMed)
-        if self.pmid and other.pmid and self.pmid == other.pmid:
-            return True
+    @property
+    def span(self):
+        return (self.start, self.end) if self.start >= 0 else None
 
-        # 3. Exact Normalized Title Match
-        if self.normalized_title and other.normalized_title and self.normalized_title == other.normalized_title:
-            return True
+    @property
+    def suffix(self):
+        # RIS records end right before "ER  -", which is written back after the text
+        return RIS_SUFFIX if self.fmt == 'ris' else ""
 
-        # 4. Title Similarity (95%+) - only run if length is similar
-        if abs(len(self.title) - len(other.title)) < 20: 
-            sim = title_similarity(self.title, other.title)
-            if sim >= 0.95:
-                return True
-            if sim >= 0.90 and self.year and other.year and self.year == other.year:
-                return True
-        
-    def is_duplicate_of(self, other):
+    @property
+    def original_text(self):
+        if self._original_text is None and self.span is not None:
+            with map_file(self.source_file) as mm:
+                return decode_block(mm[self.start:self.end]) + self.suffix
+        return self._original_text
+
+    @property
+    def authors(self):
+        if self._authors is None and self.fmt in AUTHOR_PARSERS:
+            return AUTHOR_PARSERS[self.fmt](self.original_text)
+        return self._authors
+
+    def is_duplicate_of(self, other, similarity=None):
+        return self.match_rule(other, similarity) is not None
+
+    def match_rule(self, other, similarity=None):
+        # Returns (rule, score) for the first rule that matches, or None
+        # similarity: title scorer on the difflib scale (default title_similarity)
         # 1. DOI Match
         if self.doi and other.doi and self.doi == other.doi:
-            return True
+            return ("doi", 1.0)
         
         # 2. PMID Match (if both are PubMed)
         if self.pmid and other.pmid and self.pmid == other.pmid:
-            return True
+            return ("pmid", 1.0)
 
         # 3. Exact Normalized Title Match
         if self.normalized_title and other.normalized_title and self.normalized_title == other.normalized_title:
-            return True
+            return ("title", 1.0)
 
         # 4. Title Similarity (95%+) - only run if length is similar
         if abs(len(self.title) - len(other.title)) < 20: 
-            sim = title_similarity(self.title, other.title)
+            sim = (similarity or title_similarity)(self.title, other.title)
             if sim >= 0.95:
-                return True
+                return ("fuzzy", sim)
             if sim >= 0.90 and self.year and other.year and self.year == other.year:
-                return True
+                return ("fuzzy", sim)
         
-        return False
+        return None
+
+PUBMED_SPLIT = re.compile(rb'\r?\n(?=PMID- )')
+RIS_SPLIT = re.compile(rb'\r?\nER\s+-')
+RIS_SUFFIX = "\nER  -"
+
+# Authors are only parsed when asked for (Record.authors)
+def pubmed_authors(text):
+    return re.findall(r'^FAU - (.*)', text, re.M)
+
+def bib_authors(text):
+    entry = next(iter_entries(text), None)
+    author = entry.get('author') if entry else None
+    return re.split(r'\s+and\s+', author.strip()) if author else []
+
+def ris_authors(text):
+    # Extract Authors (multiple AU lines)
+    return re.findall(r'^AU\s+-\s+(.*)', text, re.M | re.I)
+
+AUTHOR_PARSERS = {'pubmed': pubmed_authors, 'bib': bib_authors, 'ris': ris_authors}
 
 def parse_pubmed(filename):
-    records = []
-    with open(filename, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    blocks = re.split(r'\n(?=PMID- )', content)
-    for block in blocks:
-        if not block.strip(): continue
-        
-        pmid = re.search(r'^PMID- (.*)', block, re.M)
-        doi = re.search(r'^LID - (.*) \[doi\]', block, re.M) or re.search(r'^AID - (.*) \[doi\]', block, re.M)
-        title = re.search(r'^TI  - (.*?)(?=\n[A-Z]{2,4} - |\n\n|$)', block, re.S | re.M)
-        year = re.search(r'^DP  - (\d{4})', block, re.M)
-        
-        # Extract authors
-        authors = re.findall(r'^FAU - (.*)', block, re.M)
-        
-        t_str = ""
-        if title:
-            t_str = " ".join(line.strip() for line in title.group(1).split('\n'))
-
-        records.append(Record(
-            source_file=filename,
-            original_text=block,
-            pmid=pmid.group(1).strip() if pmid else None,
-            doi=doi.group(1).strip() if doi else None,
-            title=t_str,
-            authors=authors,
-            year=year.group(1).strip() if year else None
-        ))
-    return records
+    # Yields one Record per PMID block without loading the whole file
+    with map_file(filename) as mm:
+        start = 0
+        for m in PUBMED_SPLIT.finditer(mm):
+            yield from _pubmed_record(filename, mm, start, m.start())
+            start = m.end()
+        yield from _pubmed_record(filename, mm, start, len(mm))
+
+def _pubmed_record(filename, mm, start, end):
+    raw = mm[start:end]
+    block = decode_block(raw)
+    if not block.strip(): return
+
+    pmid = re.search(r'^PMID- (.*)', block, re.M)
+    doi = re.search(r'^LID - (.*) \[doi\]', block, re.M) or re.search(r'^AID - (.*) \[doi\]', block, re.M)
+    title = re.search(r'^TI  - (.*?)(?=\n[A-Z]{2,4} - |\n\n|$)', block, re.S | re.M)
+    year = re.search(r'^DP  - (\d{4})', block, re.M)
+
+    t_str = ""
+    if title:
+        t_str = " ".join(line.strip() for line in title.group(1).split('\n'))
+
+    yield Record(
+        source_file=filename,
+        span=strip_span(raw, start, end),
+        fmt='pubmed',
+        pmid=pmid.group(1).strip() if pmid else None,
+        doi=doi.group(1).strip() if doi else None,
+        title=t_str,
+        year=year.group(1).strip() if year else None
+    )
 
 def parse_bib(filename):
-    records = []
-    with open(filename, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Improved regex for BibTeX entries
-    entries = re.findall(r'@\w+\s*\{.*?\n\}', content, re.S)
-    for entry in entries:
-        title_match = re.search(r'title\s*=\s*[\{"](.*?)[}\"],', entry, re.S | re.I) or \
-                      re.search(r'title\s*=\s*\{(.*)\}', entry, re.S | re.I)
-        doi_match = re.search(r'doi\s*=\s*[\{"](.*?)[}\"]', entry, re.S | re.I)
-        year_match = re.search(r'year\s*=\s*[\{"]?(\d{4})[\"\}]?', entry, re.S | re.I)
-        author_match = re.search(r'author\s*=\s*[\{"](.*?)[}\"]', entry, re.S | re.I)
-        
-        t_str = ""
-        if title_match:
-            t_str = " ".join(line.strip() for line in title_match.group(1).split('\n'))
-            t_str = re.sub(r'[\{\}]', '', t_str)
-
-        records.append(Record(
-            source_file=filename,
-            original_text=entry,
-            doi=doi_match.group(1).strip() if doi_match else None,
-            title=t_str,
-            authors=author_match.group(1).split(' and ') if author_match else [],
-            year=year_match.group(1).strip() if year_match else None
-        ))
-    return records
+    # One linear pass with the shared brace-aware tokenizer
+    with map_file(filename) as mm:
+        for entry in iter_entries(mm):
+            title = entry.get('title')
+            doi = entry.get('doi')
+            year = entry.get('year')
+            year_match = re.match(r'\d{4}', decode_block(year).strip('{} \t\n')) if year else None
+
+            yield Record(
+                source_file=filename,
+                span=(entry.start, entry.end),
+                fmt='bib',
+                doi=decode_block(doi).strip() if doi is not None else None,
+                title=clean_value(decode_block(title)) if title else "",
+                year=year_match.group() if year_match else None
+            )
 
 def parse_ris(filename):
-    records = []
-    with open(filename, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
     # Split by ER  - (End of Record)
-    entries = re.split(r'\nER\s+-', content)
-    for entry in entries:
-        if not entry.strip(): continue
-        
-        # Extract title (TI or T1)
-        title_match = re.search(r'^(?:TI|T1)\s+-\s+(.*)', entry, re.M | re.I)
-        # Extract DOI
-        doi_match = re.search(r'^DO\s+-\s+(.*)', entry, re.M | re.I)
-        # Extract Year
-        year_match = re.search(r'^PY\s+-\s+(\d{4})', entry, re.M | re.I)
-        # Extract Authors (multiple AU lines)
-        authors = re.findall(r'^AU\s+-\s+(.*)', entry, re.M | re.I)
-        
-        t_str = title_match.group(1).strip() if title_match else ""
-
-        records.append(Record(
-            source_file=filename,
-            original_text=entry + "\nER  -",
-            doi=doi_match.group(1).strip() if doi_match else None,
-            title=t_str,
-            authors=authors,
-            year=year_match.group(1).strip() if year_match else None
-        ))
-    return records
-
-def process_file(records, label, master_seen_dois, master_seen_titles, master_unique_list):
+    with map_file(filename) as mm:
+        start = 0
+        for m in RIS_SPLIT.finditer(mm):
+            yield from _ris_record(filename, mm, start, m.start())
+            start = m.end()
+        yield from _ris_record(filename, mm, start, len(mm))
+
+def _ris_record(filename, mm, start, end):
+    raw = mm[start:end]
+    entry = decode_block(raw)
+    if not entry.strip(): return
+
+    # Extract title (TI or T1)
+    title_match = re.search(r'^(?:TI|T1)\s+-\s+(.*)', entry, re.M | re.I)
+    # Extract DOI
+    doi_match = re.search(r'^DO\s+-\s+(.*)', entry, re.M | re.I)
+    # Extract Year
+    year_match = re.search(r'^PY\s+-\s+(\d{4})', entry, re.M | re.I)
+
+    t_str = title_match.group(1).strip() if title_match else ""
+
+    yield Record(
+        source_file=filename,
+        span=strip_span(raw, start, end, right=False),
+        fmt='ris',
+        doi=doi_match.group(1).strip() if doi_match else None,
+        title=t_str,
+        year=year_match.group(1).strip() if year_match else None
+    )
+
+def process_file(records, label, master_seen_dois, master_seen_titles, master_unique_list, index=None):
     print(f"Deduplicating {label}...")
+    if index is None:
+        # Standalone use: index what has been kept so far
+        records = list(records)
+        index = CandidateIndex(gram_frequencies(master_unique_list + records))
+        for u in master_unique_list:
+            index.add(u)
+
     local_unique = []
     for r in records:
         # Check against master first
@@ -171,40 +227,50 @@ def process_file(records, label, master_seen_dois, master_seen_titles, master_un
             continue
         if r.normalized_title and r.normalized_title in master_seen_titles:
             continue
-            
-        is_dup = False
-        for u in master_unique_list:
-            if r.is_duplicate_of(u):
-                is_dup = True
-                break
-        
-        if is_dup: continue
-        
-        # Check against current local unique (intra-file)
-        for lu in local_unique:
-            if r.is_duplicate_of(lu):
-                is_dup = True
-                break
-        
-        if not is_dup:
-            local_unique.append(r)
-            master_unique_list.append(r)
-            if r.doi: master_seen_dois.add(r.doi)
-            if r.normalized_title: master_seen_titles.add(r.normalized_title)
+
+        # Only compare against candidates sharing a DOI/PMID/title key or a title block.
+        # local_unique is part of the index, so this also covers intra-file duplicates.
+        if index.find_duplicate(r) is not None:
+            continue
+
+        local_unique.append(r)
+        master_unique_list.append(r)
+        index.add(r)
+        if r.doi: master_seen_dois.add(r.doi)
+        if r.normalized_title: master_seen_titles.add(r.normalized_title)
             
     return local_unique
 
-def save_pubmed(records, filename):
-    with open(filename, 'w', encoding='utf-8') as f:
-        f.write("\n\n".join(r.original_text.strip() for r in records))
+def record_texts(records):
+    # Yields each record's text, mapping every source file only once
+    with ExitStack() as stack:
+        maps = {}
+        for r in records:
+            if r.span is None:
+                yield r.original_text.strip()
+                continue
+            mm = maps.get(r.source_file)
+            if mm is None:
+                mm = maps[r.source_file] = stack.enter_context(map_file(r.source_file))
+            yield decode_block(mm[r.start:r.end]) + r.suffix
+
+def write_records(records, filename, append=False):
+    # Streams each record's byte range from its source file, one record at a time
+    sep = append and os.path.exists(filename) and os.path.getsize(filename) > 0
+    with open(filename, 'a' if append else 'w', encoding='utf-8') as f:
+        for text in record_texts(records):
+            if sep: f.write("\n\n")
+            f.write(text)
+            sep = True
+
+def save_pubmed(records, filename, append=False):
+    write_records(records, filename, append)
 
-def save_bib(records, filename):
-    with open(filename, 'w', encoding='utf-8') as f:
-        f.write("\n\n".join(r.original_text.strip() for r in records))
+def save_bib(records, filename, append=False):
+    write_records(records, filename, append)
 
-def save_ris(records, filename):
-    with open(filename, 'w', encoding='utf-8') as f:
-        f.write("\n\n".join(r.original_text.strip() for r in records))
+def save_ris(records, filename, append=False):
+    write_records(records, filename, append)
 
 # Configuration: Update these filenames to match your input files
 pubmed_path = 'pubmed_input.txt'
@@ -212,30 +278,66 @@ wos_path = 'wos_input.bib'
 scopus_path = 'scopus_input.bib'
 ris_path = 'articles.ris'
 
-def main():
-    all_recs_to_process = []
+def parse_all(parse_func, filename):
+    return list(parse_func(filename))
+
+def deduplicate(parsed, labels, title_engine="prefix", workers=1, stored=(), clusters=False):
+    # parsed: one record list per input file, in priority order
+    # stored: (record, signature) pairs kept by earlier runs (see dedup_store)
+    # Returns the kept records of each input file
+    stored_records = [r for r, _ in stored]
+    if clusters:
+        # Keep one representative per duplicate cluster and write the audit report
+        return cluster_records([stored_records] + parsed, ["Index"] + labels, workers, title_engine)[1:]
+    workers = use_workers(workers, len(stored_records) + sum(len(recs) for recs in parsed))
+    if workers > 1:
+        # Stored records go first so they win over new copies, as in the sequential run
+        return deduplicate_parallel([stored_records] + parsed, workers, title_engine)[1:]
+
+    master_seen_dois = set()
+    master_seen_titles = set()
+    master_unique_list = []
+    gram_freq = None
+    if title_engine == "prefix":
+        # Rank title grams by how common they are across every input file
+        gram_freq = gram_frequencies(r for recs in [stored_records] + parsed for r in recs)
+    corpus = [r for recs in [stored_records] + parsed for r in recs] if title_engine == "tfidf" else None
+    index = CandidateIndex(gram_freq, title_engine, corpus=corpus)
+    if hasattr(index.blocker, 'report'):
+        print(index.blocker.report())
+    for r, sig in stored:
+        index.add(r, sig)
+        master_unique_list.append(r)
+        if r.doi: master_seen_dois.add(r.doi)
+        if r.normalized_title: master_seen_titles.add(r.normalized_title)
+
+    return [process_file(recs, label, master_seen_dois, master_seen_titles, master_unique_list, index)
+            for recs, label in zip(parsed, labels)]
+
+def main(title_engine="prefix", workers=1, index_db=None, clusters=False):
+    inputs = []
     
-    # Check and parse PubMed
+    # Check PubMed
     if os.path.exists(pubmed_path):
         print(f"Found PubMed: {pubmed_path}")
-        all_recs_to_process.append((parse_pubmed(pubmed_path), "PubMed", "pubmed_deduplicated.txt", save_pubmed))
+        inputs.append((parse_pubmed, pubmed_path, "PubMed", "pubmed_deduplicated.txt", save_pubmed))
     
-    # Check and parse WoS
+    # Check WoS
     if os.path.exists(wos_path):
         print(f"Found WoS: {wos_path}")
-        all_recs_to_process.append((parse_bib(wos_path), "WoS", "wos_deduplicated.bib", save_bib))
+        inputs.append((parse_bib, wos_path, "WoS", "wos_deduplicated.bib", save_bib))
         
-    # Check and parse Scopus
+    # Check Scopus
     if os.path.exists(scopus_path):
         print(f"Found Scopus: {scopus_path}")
-        all_recs_to_process.append((parse_bib(scopus_path), "Scopus", "scopus_deduplicated.bib", save_bib))
+        inputs.append((parse_bib, scopus_path, "Scopus", "scopus_deduplicated.bib", save_bib))
 
-    # Check and parse RIS
+    # Check RIS
     if os.path.exists(ris_path):
         print(f"Found RIS: {ris_path}")
-        all_recs_to_process.append((parse_ris(ris_path), "RIS", "ris_deduplicated.ris", save_ris))
+        inputs.append((parse_ris, ris_path, "RIS", "ris_deduplicated.ris", save_ris))
 
-    if not all_recs_to_process:
+    if not inputs:
         print("No input files found. Please ensure your files are named correctly:")
         print(f" - {pubmed_path}")
         print(f" - {wos_path}")
@@ -243,24 +345,67 @@ def main():
         print(f" - {ris_path}")
         return
 
-    master_seen_dois = set()
-    master_seen_titles = set()
-    master_unique_list = []
+    # Parse every input (one process per file in parallel mode)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = list(pool.map(parse_all, [i[0] for i in inputs], [i[1] for i in inputs]))
+    else:
+        parsed = [parse_all(parse_func, path) for parse_func, path, _, _, _ in inputs]
 
+    # Incremental mode: skip input records seen by earlier runs and match the rest
+    # against the records those runs kept
+    store = None
+    stored = []
+    hashes = []
+    if index_db:
+        store = DedupStore(index_db)
+        append = not store.is_empty()
+        stored = list(store.load(Record))
+        seen = store.seen_hashes()
+        hashes = [[content_hash(text) for text in record_texts(recs)] for recs in parsed]
+        total = sum(len(recs) for recs in parsed)
+        parsed = [[r for r, h in zip(recs, hs) if h not in seen] for recs, hs in zip(parsed, hashes)]
+        print(f"Index {index_db}: {len(stored)} stored records, {sum(len(recs) for recs in parsed)} of {total} input records are new")
+    else:
+        append = False
+
+    kept = deduplicate(parsed, [i[2] for i in inputs], title_engine, workers, stored, clusters)
     final_results = []
-    for recs, label, out_name, save_func in all_recs_to_process:
-        final_recs = process_file(recs, label, master_seen_dois, master_seen_titles, master_unique_list)
-        final_results.append((final_recs, out_name, save_func))
+    for final_recs, (_, _, label, out_name, save_func) in zip(kept, inputs):
+        final_results.append((final_recs, label, out_name, save_func))
 
-    print(f"\nFinal counts (Deduplicated):")
-    for recs, out_name, _ in final_results:
+    if append:
+        print("\nNew unique records (appended):")
+    else:
+        print(f"\nFinal counts (Deduplicated):")
+    for recs, _, out_name, _ in final_results:
         print(f"{out_name}: {len(recs)}")
 
     # Save the files
-    for recs, out_name, save_func in final_results:
-        save_func(recs, out_name)
+    for recs, _, out_name, save_func in final_results:
+        save_func(recs, out_name, append)
+
+    # Update the index only once the outputs are written
+    if store:
+        for recs, label, _, _ in final_results:
+            sigs = [signature(r.title) if r.title else None for r in recs] if title_engine == "minhash" else None
+            store.add(recs, label, sigs)
+        store.mark_seen(h for hs in hashes for h in hs)
+        store.commit()
+        store.close()
 
     print("\nFiles saved successfully.")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--title-engine", choices=TITLE_ENGINES, default="prefix",
+                        help="Fuzzy title candidate search: exact q-gram prefix filter or MinHash/LSH")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Parse inputs and score duplicate candidates on N processes")
+    parser.add_argument("--index-db", default=None,
+                        help="SQLite index of earlier runs; only new records are compared and appended")
+    parser.add_argument("--clusters", action="store_true",
+                        help="Group duplicates into clusters and write dedup_clusters.csv/.json")
+    args = parser.parse_args()
+    main(title_engine=args.title_engine, workers=args.workers, index_db=args.index_db,
+         clusters=args.clusters)
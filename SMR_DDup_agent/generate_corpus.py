@@ -0,0 +1,178 @@
+import os
+import random
+import string
+import textwrap
+import argparse
+
+from deduplicate_files import pubmed_path, wos_path, scopus_path, ris_path
+
+# Synthetic search exports for benchmarking the deduplication.
+#
+# Writes PubMed (MEDLINE), WoS and Scopus (BibTeX) and RIS files under the
+# usual input names, plus corpus_truth.tsv mapping every record (file, position)
+# to the study it was generated from. A share of the records are extra copies of
+# earlier studies, optionally placed in another export, with title typos, case
+# changes and missing DOIs. Studies are regenerated from their number and the
+# seed instead of being kept in memory, so 1M-record corpora are cheap to write.
+
+TRUTH_FILE = "corpus_truth.tsv"
+
+# Share of records written to each export
+SOURCES = [(pubmed_path, 0.35), (wos_path, 0.25), (scopus_path, 0.25), (ris_path, 0.15)]
+
+VOCABULARY_SIZE = 5000
+MEDICAL_WORDS = ("giant cell tumor of the cervical spine outcomes surgery resection denosumab "
+                 "case report review analysis patients spinal fusion anterior posterior approach "
+                 "metastatic lesion radiotherapy recurrence long term follow up cohort study clinical "
+                 "evaluation treatment management vertebral body atlantoaxial osteoclastoma").split()
+
+
+def vocabulary(seed):
+    rng = random.Random(seed)
+    words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 11)))
+             for _ in range(VOCABULARY_SIZE)]
+    return MEDICAL_WORDS + words
+
+
+def study(number, seed, words):
+    # The same (number, seed) always gives the same study
+    rng = random.Random(f"{seed}:{number}")
+    title = " ".join(rng.choice(words) for _ in range(rng.randint(6, 16))).capitalize()
+    authors = [f"{rng.choice(words).capitalize()}, {rng.choice(string.ascii_uppercase)}"
+               for _ in range(rng.randint(1, 6))]
+    return {
+        'title': title,
+        'doi': f"10.{1000 + number % 9000}/smr.{number}",
+        'pmid': str(30000000 + number),
+        'year': str(rng.randint(1990, 2025)) if rng.random() < 0.95 else None,
+        'authors': authors,
+    }
+
+
+def add_typos(rng, title, count):
+    chars = list(title)
+    for _ in range(count):
+        i = rng.randrange(len(chars))
+        op = rng.random()
+        if op < 0.33:
+            del chars[i]
+        elif op < 0.66:
+            chars.insert(i, rng.choice(string.ascii_lowercase))
+        else:
+            chars[i] = rng.choice(string.ascii_lowercase)
+    return "".join(chars)
+
+
+def pubmed_entry(s):
+    lines = [f"PMID- {s['pmid']}"]
+    if s['year']:
+        lines.append(f"DP  - {s['year']} Jan")
+    # MEDLINE wraps long titles onto indented continuation lines
+    for i, part in enumerate(textwrap.wrap(s['title'], 74)):
+        lines.append(("TI  - " if i == 0 else "      ") + part)
+    if s['doi']:
+        lines.append(f"LID - {s['doi']} [doi]")
+    for author in s['authors']:
+        lines.append(f"FAU - {author}")
+    return "\n".join(lines) + "\n\n"
+
+
+def bib_entry(s, key, wos=False):
+    fields = [("Author" if wos else "author", " and ".join(s['authors'])),
+              ("Title" if wos else "title", s['title'])]
+    if s['year']:
+        fields.append(("Year" if wos else "year", s['year']))
+    if s['doi']:
+        fields.append(("DOI" if wos else "doi", s['doi']))
+    body = ",\n".join(f"  {name} = {{{value}}}" for name, value in fields)
+    prefix = "WOS:" if wos else "SCOPUS:"
+    return f"@article{{{prefix}{key},\n{body},\n}}\n\n"
+
+
+def ris_entry(s):
+    lines = ["TY  - JOUR", f"TI  - {s['title']}"]
+    for author in s['authors']:
+        lines.append(f"AU  - {author}")
+    if s['year']:
+        lines.append(f"PY  - {s['year']}")
+    if s['doi']:
+        lines.append(f"DO  - {s['doi']}")
+    lines.append("ER  - ")
+    return "\n".join(lines) + "\n\n"
+
+
+def generate(out_dir, records, dup_rate=0.3, typo_rate=0.3, max_typos=3,
+             missing_doi=0.2, cross_format=0.7, seed=0):
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    words = vocabulary(seed)
+    paths = [p for p, _ in SOURCES]
+    weights = [w for _, w in SOURCES]
+    files = {p: open(os.path.join(out_dir, p), 'w', encoding='utf-8', newline='\n') for p in paths}
+    positions = dict.fromkeys(paths, 0)
+    homes = []  # export each study was first written to
+    try:
+        with open(os.path.join(out_dir, TRUTH_FILE), 'w', encoding='utf-8') as truth:
+            truth.write("file\tindex\tstudy\n")
+            for _ in range(records):
+                if homes and rng.random() < dup_rate:
+                    number = rng.randrange(len(homes))
+                    s = study(number, seed, words)
+                    if rng.random() < cross_format:
+                        path = rng.choices(paths, weights)[0]
+                    else:
+                        path = homes[number]
+                    if rng.random() < typo_rate:
+                        s['title'] = add_typos(rng, s['title'], rng.randint(1, max_typos))
+                    if rng.random() < 0.2:
+                        s['title'] = s['title'].upper() if rng.random() < 0.5 else s['title'] + "."
+                else:
+                    number = len(homes)
+                    s = study(number, seed, words)
+                    path = rng.choices(paths, weights)[0]
+                    homes.append(path)
+                if rng.random() < missing_doi:
+                    s['doi'] = None
+
+                out = files[path]
+                if path == pubmed_path:
+                    out.write(pubmed_entry(s))
+                elif path == ris_path:
+                    out.write(ris_entry(s))
+                else:
+                    out.write(bib_entry(s, positions[path], wos=(path == wos_path)))
+                truth.write(f"{path}\t{positions[path]}\t{number}\n")
+                positions[path] += 1
+    finally:
+        for f in files.values():
+            f.close()
+
+    return len(homes)
+
+
+def load_truth(corpus_dir):
+    # {file name: [study number of each record, in file order]}
+    truth = {}
+    with open(os.path.join(corpus_dir, TRUTH_FILE), encoding='utf-8') as f:
+        next(f)
+        for line in f:
+            path, _, number = line.rstrip('\n').split('\t')
+            truth.setdefault(path, []).append(int(number))
+    return truth
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic PubMed/BibTeX/RIS corpus with known duplicates")
+    parser.add_argument("out_dir", help="Directory for the generated input files")
+    parser.add_argument("--records", type=int, default=10000, help="Total number of records")
+    parser.add_argument("--dup-rate", type=float, default=0.3, help="Share of records that copy an earlier study")
+    parser.add_argument("--typo-rate", type=float, default=0.3, help="Share of copies with typos in the title")
+    parser.add_argument("--max-typos", type=int, default=3, help="Most character edits per noisy title")
+    parser.add_argument("--missing-doi", type=float, default=0.2, help="Share of records written without a DOI")
+    parser.add_argument("--cross-format", type=float, default=0.7,
+                        help="Share of copies placed in a random export instead of the original one")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    studies = generate(args.out_dir, args.records, args.dup_rate, args.typo_rate, args.max_typos,
+                       args.missing_doi, args.cross_format, args.seed)
+    print(f"Wrote {args.records} records ({studies} unique studies) to {args.out_dir}")
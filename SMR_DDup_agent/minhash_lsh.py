@@ -0,0 +1,96 @@
+import zlib
+from bisect import bisect_left
+from itertools import islice
+
+# Near-duplicate title blocking with MinHash signatures and LSH banding.
+#
+# Each title is reduced to its set of character shingles and summarised by a
+# one-permutation MinHash signature: shingles are hashed once, spread over
+# NUM_BINS bins, and the minimum hash of each bin is kept (empty bins borrow
+# from their right-hand neighbour). Signatures are cut into BANDS bands of
+# ROWS values; titles that agree on any whole band become candidates. With
+# 32 bands of 4 rows a pair with shingle Jaccard 0.6 is found ~99% of the
+# time, well below what a 0.90 SequenceMatcher ratio usually implies. Results
+# are still verified with Record.is_duplicate_of, so this only trades a small
+# chance of a missed candidate for linear-time candidate generation.
+
+SHINGLE_SIZE = 3
+NUM_BINS = 128
+BANDS = 32
+ROWS = NUM_BINS // BANDS
+_BIN_BITS = NUM_BINS.bit_length() - 1
+_EMPTY = -1
+
+
+def shingles(title):
+    s = title.lower()
+    return {s[i:i + SHINGLE_SIZE] for i in range(len(s) - SHINGLE_SIZE + 1)}
+
+
+def signature(title):
+    # Returns a list of NUM_BINS ints, or None for titles too short to shingle
+    sh = shingles(title)
+    if not sh:
+        return None
+    sig = [_EMPTY] * NUM_BINS
+    for s in sh:
+        h = zlib.crc32(s.encode('utf-8'))
+        b = h & (NUM_BINS - 1)
+        v = h >> _BIN_BITS
+        if sig[b] == _EMPTY or v < sig[b]:
+            sig[b] = v
+
+    # Densify: an empty bin takes the next filled bin's value, offset by the distance
+    if _EMPTY in sig:
+        filled = [i for i, v in enumerate(sig) if v != _EMPTY]
+        dense = list(sig)
+        for i, v in enumerate(sig):
+            if v != _EMPTY:
+                continue
+            for j in filled:
+                if j > i:
+                    break
+            else:
+                j = filled[0] + NUM_BINS
+            dense[i] = sig[j % NUM_BINS] + (j - i) * (1 << (32 - _BIN_BITS))
+        sig = dense
+    return sig
+
+
+def _ids_below(ids, below):
+    return ids if below is None else islice(ids, bisect_left(ids, below))
+
+
+def band_keys(sig):
+    return [(band, tuple(sig[band * ROWS:(band + 1) * ROWS])) for band in range(BANDS)]
+
+
+class MinHashLSH:
+    def __init__(self):
+        self.buckets = {}
+        self.unfiltered = []
+
+    def add(self, rid, record, sig=None):
+        if sig is None:
+            sig = signature(record.title)
+        if sig is None:
+            self.unfiltered.append(rid)
+            return
+        for key in band_keys(sig):
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                self.buckets[key] = [rid]
+            else:
+                bucket.append(rid)
+
+    def candidates(self, record, below=None):
+        # below: only ids smaller than this (buckets are in insertion order)
+        found = set(_ids_below(self.unfiltered, below))
+        sig = signature(record.title)
+        if sig is None:
+            return found
+        for key in band_keys(sig):
+            bucket = self.buckets.get(key)
+            if bucket:
+                found.update(_ids_below(bucket, below))
+        return found
@@ -0,0 +1,114 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from candidate_index import CandidateIndex, gram_frequencies
+
+# Multi-core deduplication.
+#
+# The sequential run keeps a record unless it duplicates a record kept before
+# it. The index of all records is built once in the parent; workers inherit it
+# (fork) and find, for every record, the FIRST earlier record it duplicates,
+# stopping there like the sequential scan does. A single ordered pass then
+# replays the keep/drop decisions: a record whose first match was kept is
+# dropped, and only when that match was itself dropped does the pass look
+# further, among the kept records only. Because a record only ever depends on
+# records that come before it, this reproduces the sequential result exactly,
+# including which source file's copy survives.
+#
+# Below PARALLEL_MIN_RECORDS, or with a single CPU, the pool costs more than it
+# saves and deduplicate_files.py runs sequentially instead.
+
+CHUNK_SIZE = 500
+PARALLEL_MIN_RECORDS = 10000
+
+_index = None
+
+
+def use_workers(workers, n_records):
+    # Number of processes worth starting for n_records (1 = run sequentially)
+    workers = min(workers, os.cpu_count() or 1)
+    return workers if workers > 1 and n_records >= PARALLEL_MIN_RECORDS else 1
+
+
+def build_index(records, title_engine="prefix"):
+    gram_freq = gram_frequencies(records) if title_engine == "prefix" else None
+    corpus = records if title_engine == "tfidf" else None
+    index = CandidateIndex(gram_freq, title_engine, keep_all=True, corpus=corpus)
+    for r in records:
+        index.add(r)
+    return index
+
+
+def _init_worker(records, title_engine):
+    # Only used where processes are spawned rather than forked (Windows):
+    # there each worker has to build its own copy of the index
+    global _index
+    _index = build_index(records, title_engine)
+
+
+def _score_chunk(bounds):
+    start, stop = bounds
+    return [_index.earlier_matches(rid) for rid in range(start, stop)]
+
+
+def _first_chunk(bounds):
+    start, stop = bounds
+    return [_index.first_earlier_match(rid) for rid in range(start, stop)]
+
+
+def _map_chunks(index, records, workers, title_engine, func):
+    # Runs func over the record ids in chunks, in order, on workers sharing index
+    global _index
+    chunks = [(i, min(i + CHUNK_SIZE, len(records))) for i in range(0, len(records), CHUNK_SIZE)]
+    if "fork" in multiprocessing.get_all_start_methods():
+        # Forked workers see the parent's index without pickling or rebuilding it
+        _index = index
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"))
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(records, title_engine))
+    results = []
+    try:
+        with pool:
+            for part in pool.map(func, chunks):
+                results.extend(part)
+    finally:
+        _index = None
+    return results
+
+
+def find_matches(records, workers, title_engine="prefix"):
+    # matches[i] lists (id, rule, score) for every earlier record that records[i] duplicates
+    index = build_index(records, title_engine)
+    workers = use_workers(workers, len(records))
+    if workers <= 1:
+        return [index.earlier_matches(rid) for rid in range(len(records))]
+    return _map_chunks(index, records, workers, title_engine, _score_chunk)
+
+
+def select_unique(index, firsts):
+    # firsts[i]: the first earlier record that record i duplicates, or None
+    kept = set()
+    for rid, first in enumerate(firsts):
+        if first is None:
+            kept.add(rid)
+        elif first not in kept and index.first_earlier_match(rid, after=first, among=kept) is None:
+            kept.add(rid)
+    return kept
+
+
+def deduplicate_parallel(file_records, workers, title_engine="prefix"):
+    # file_records: one record list per input file, in priority order
+    records = [r for recs in file_records for r in recs]
+    print(f"Scoring {len(records)} records on {workers} workers...")
+    index = build_index(records, title_engine)
+    firsts = _map_chunks(index, records, workers, title_engine, _first_chunk)
+    kept = select_unique(index, firsts)
+
+    results = []
+    offset = 0
+    for recs in file_records:
+        results.append([r for i, r in enumerate(recs, offset) if i in kept])
+        offset += len(recs)
+    return results
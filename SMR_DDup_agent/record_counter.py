@@ -0,0 +1,67 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+# Record counting shared by count_records.py and verify_clean.py.
+#
+# Files are read in fixed-size binary chunks, so multi-GB exports are never held
+# in memory. Every record marker starts with a newline (the file start counts as
+# one), and the last MAX_MARKER bytes of each chunk are carried over to the next,
+# so a marker split across a chunk boundary is still counted exactly once.
+
+CHUNK_SIZE = 1 << 20
+MAX_MARKER = 128
+
+MARKERS = {
+    # One PMID line per MEDLINE record
+    'pubmed': re.compile(rb'\nPMID- '),
+    # Any @type{ entry at the start of a line (any case, any entry type, as in
+    # parse_bib); @comment/@string/@preamble are filtered out in count_markers
+    'bib': re.compile(rb'\n[ \t]{0,16}@((?:\w|[\x80-\xff]){1,32})[ \t]{0,16}\{'),
+    # One end-of-record line per RIS record
+    'ris': re.compile(rb'\nER\s{1,16}-'),
+}
+NON_RECORD_ENTRIES = {b'comment', b'string', b'preamble'}
+
+EXTENSIONS = {'.txt': 'pubmed', '.nbib': 'pubmed', '.bib': 'bib', '.ris': 'ris'}
+
+
+def file_format(filename):
+    return EXTENSIONS.get(os.path.splitext(filename)[1].lower())
+
+
+def count_markers(filename, fmt=None, chunk_size=CHUNK_SIZE):
+    # Number of records in filename, or 0 if it does not exist
+    if not os.path.exists(filename):
+        return 0
+    pattern = MARKERS[fmt or file_format(filename)]
+    count = 0
+    carry = b'\n'
+    with open(filename, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            buf = carry + chunk
+            # Markers starting in the last MAX_MARKER bytes may continue in the next chunk
+            limit = len(buf) if not chunk else max(len(buf) - MAX_MARKER, 0)
+            end = 0
+            for m in pattern.finditer(buf):
+                if m.start() >= limit:
+                    break
+                if pattern.groups and m.group(1).lower() in NON_RECORD_ENTRIES:
+                    continue
+                count += 1
+                end = m.end()
+            if not chunk:
+                return count
+            carry = buf[max(limit, end):]
+
+
+def count_files(paths, workers=1, chunk_size=CHUNK_SIZE):
+    # {path: record count}, counting several files at once when workers > 1
+    paths = list(paths)
+    if workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+            counts = list(pool.map(count_markers, paths, [None] * len(paths), [chunk_size] * len(paths)))
+    else:
+        counts = [count_markers(p, chunk_size=chunk_size) for p in paths]
+    return dict(zip(paths, counts))
@@ -0,0 +1,173 @@
+import math
+from collections import Counter
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = None
+    sparse = None
+
+from candidate_index import SAME_YEAR_THRESHOLD, FUZZY_THRESHOLD, title_similarity, ids_below
+
+# Batch fuzzy-title engine based on character n-gram TF-IDF vectors.
+#
+# All titles are vectorised in one shot into a sparse matrix with L2-normalised
+# rows, and blocked sparse products X[block] @ X.T give each title its TOP_K
+# most similar titles by cosine. Those neighbours are the candidates, and the
+# cosine (mapped onto the difflib scale, see calibrate) replaces
+# title_similarity in Record.is_duplicate_of, so the usual 0.90/0.95 rules apply.
+
+NGRAM = 3
+TOP_K = 10
+# Entries allowed in one block of X[block] @ X.T. Titles share common grams, so
+# a block row is close to dense (a third of all titles on a 30k corpus); the
+# block height is therefore this budget divided by the number of titles,
+# which keeps memory per block flat (~250 MB) however large the merge.
+BLOCK_NNZ = 20_000_000
+MIN_COSINE = 0.5
+CALIBRATION_PAIRS = 2000
+TARGET_RECALL = 0.99
+# Cosine cutoffs used when there are too few candidate pairs to calibrate on
+DEFAULT_CUTOFFS = {SAME_YEAR_THRESHOLD: 0.80, FUZZY_THRESHOLD: 0.88}
+
+
+def title_ngrams(title):
+    s = title.lower()
+    return [s[i:i + NGRAM] for i in range(len(s) - NGRAM + 1)]
+
+
+class TfidfTitleMatcher:
+    def __init__(self, records, top_k=TOP_K):
+        if np is None:
+            raise ImportError("The tfidf title engine needs numpy and scipy (pip install numpy scipy)")
+        self.top_k = top_k
+        self.rows = {}
+        titles = []
+        for r in records:
+            if r.title and r.title not in self.rows:
+                self.rows[r.title] = len(titles)
+                titles.append(r.title)
+        self.titles = titles
+        self.matrix = self._vectorise(titles)
+        self.neighbours = self._top_neighbours()
+        self.row_ids = {}
+        self.cutoffs = dict(DEFAULT_CUTOFFS)
+        self.calibration = {}
+        self.calibrate()
+
+    def _vectorise(self, titles):
+        vocab = {}
+        rows, cols, tfs = [], [], []
+        for i, title in enumerate(titles):
+            for gram, count in Counter(title_ngrams(title)).items():
+                rows.append(i)
+                cols.append(vocab.setdefault(gram, len(vocab)))
+                tfs.append(1.0 + math.log(count))
+        n = len(titles)
+        tf = sparse.csr_matrix((np.array(tfs, dtype=np.float32), (rows, cols)),
+                               shape=(n, max(len(vocab), 1)))
+        df = np.bincount(np.array(cols, dtype=np.int64), minlength=tf.shape[1])
+        idf = np.log((1.0 + n) / (1.0 + df)) + 1.0
+        x = tf.multiply(idf.astype(np.float32)).tocsr()
+        norms = np.sqrt(np.asarray(x.multiply(x).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return sparse.diags((1.0 / norms).astype(np.float32)).dot(x).tocsr()
+
+    def _top_neighbours(self):
+        # neighbours[i] maps row j -> cosine for the top_k rows of i (kept symmetric)
+        n = self.matrix.shape[0]
+        neighbours = [{} for _ in range(n)]
+        xt = self.matrix.T.tocsc()
+        block_rows = max(1, BLOCK_NNZ // max(n, 1))
+        for start in range(0, n, block_rows):
+            block = self.matrix[start:start + block_rows].dot(xt).tocsr()
+            for offset in range(block.shape[0]):
+                i = start + offset
+                lo, hi = block.indptr[offset], block.indptr[offset + 1]
+                cols, vals = block.indices[lo:hi], block.data[lo:hi]
+                keep = (vals >= MIN_COSINE) & (cols != i)
+                cols, vals = cols[keep], vals[keep]
+                if len(vals) > self.top_k:
+                    top = np.argpartition(-vals, self.top_k)[:self.top_k]
+                    cols, vals = cols[top], vals[top]
+                for j, v in zip(cols.tolist(), vals.tolist()):
+                    neighbours[i][j] = v
+                    neighbours[j][i] = v
+        return neighbours
+
+    def cosine(self, a, b):
+        ra, rb = self.rows.get(a), self.rows.get(b)
+        if ra is None or rb is None:
+            return 0.0
+        if ra == rb:
+            return 1.0
+        cos = self.neighbours[ra].get(rb)
+        if cos is None:
+            cos = float(self.matrix[ra].multiply(self.matrix[rb]).sum())
+        return cos
+
+    def similarity(self, a, b):
+        # Piecewise-linear map of cosine onto the difflib scale through the cutoffs
+        cos = self.cosine(a, b)
+        knots = [(0.0, 0.0)] + sorted((c, t) for t, c in self.cutoffs.items()) + [(1.0, 1.0)]
+        for (c0, t0), (c1, t1) in zip(knots, knots[1:]):
+            if cos <= c1:
+                return t0 + (t1 - t0) * (cos - c0) / (c1 - c0) if c1 > c0 else t1
+        return 1.0
+
+    def calibrate(self):
+        # Pick, for each difflib threshold, the cosine cutoff that keeps
+        # TARGET_RECALL of the neighbour pairs difflib puts above it
+        pairs = [(i, j, cos) for i, nb in enumerate(self.neighbours) for j, cos in nb.items() if i < j]
+        if len(pairs) > CALIBRATION_PAIRS:
+            step = len(pairs) / CALIBRATION_PAIRS
+            pairs = [pairs[int(k * step)] for k in range(CALIBRATION_PAIRS)]
+        scored = [(cos, title_similarity(self.titles[i], self.titles[j])) for i, j, cos in pairs]
+
+        for threshold in sorted(self.cutoffs):
+            positives = sorted(cos for cos, ratio in scored if ratio >= threshold)
+            if len(positives) < 20:
+                continue
+            cutoff = positives[int((1 - TARGET_RECALL) * len(positives))]
+            self.cutoffs[threshold] = min(cutoff, 0.999)
+
+        # Cutoffs must increase with the difflib threshold
+        low, high = self.cutoffs[SAME_YEAR_THRESHOLD], self.cutoffs[FUZZY_THRESHOLD]
+        if low >= high:
+            self.cutoffs[SAME_YEAR_THRESHOLD] = high - 1e-6
+
+        for threshold, cutoff in self.cutoffs.items():
+            hits = [ratio >= threshold for cos, ratio in scored if cos >= cutoff]
+            positives = sum(ratio >= threshold for cos, ratio in scored)
+            self.calibration[threshold] = {
+                'cutoff': cutoff,
+                'pairs': len(scored),
+                'recall': sum(hits) / positives if positives else None,
+                'precision': sum(hits) / len(hits) if hits else None,
+            }
+
+    def report(self):
+        lines = []
+        for threshold in sorted(self.calibration):
+            c = self.calibration[threshold]
+            recall = f"{c['recall']:.1%}" if c['recall'] is not None else "n/a"
+            precision = f"{c['precision']:.1%}" if c['precision'] is not None else "n/a"
+            lines.append(f"TF-IDF cosine {c['cutoff']:.3f} ~ difflib {threshold:.2f} "
+                         f"(recall {recall}, precision {precision} vs difflib on {c['pairs']} neighbour pairs)")
+        return "\n".join(lines)
+
+    # Blocker interface used by CandidateIndex
+    def add(self, rid, record, sig=None):
+        row = self.rows.get(record.title)
+        if row is not None:
+            self.row_ids.setdefault(row, []).append(rid)
+
+    def candidates(self, record, below=None):
+        found = set()
+        row = self.rows.get(record.title)
+        if row is None:
+            return found
+        for j in list(self.neighbours[row]) + [row]:
+            found.update(ids_below(self.row_ids.get(j, []), below))
+        return found
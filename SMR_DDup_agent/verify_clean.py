@@ -1,24 +1,18 @@
-import re
+import os
+import argparse
 
-def count_pubmed(filename):
-    with open(filename, 'r', encoding='utf-8') as f:
-        content = f.read()
-        return len(re.findall(r'^PMID- ', content, re.MULTILINE))
+from count_records import report
+from record_counter import CHUNK_SIZE
 
-def count_bib(filename):
-    with open(filename, 'r', encoding='utf-8') as f:
-        content = f.read()
-        return len(re.findall(r'@(?:article|ARTICLE|inproceedings|BOOK|book|phdthesis|mastersthesis|techreport|misc)\{', content))
+# Counts the deduplicated files only (see count_records.py for input vs. deduplicated)
 
-files = {
-    'PubMed Clean': 'pubmed_deduplicated.txt',
-    'Scopus Clean': 'scopus_deduplicated.bib',
-    'WoS Clean': 'wos_deduplicated.bib'
-}
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Count records in the deduplicated files")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Count up to N files in parallel")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help="Bytes read per chunk")
+    args = parser.parse_args()
 
-for label, path in files.items():
-    if label == 'PubMed Clean':
-        count = count_pubmed(path)
-    else:
-        count = count_bib(path)
-    print(f"{label}: {count}")
+    for label, _, count in report(args.workers, args.chunk_size, inputs=False):
+        print(f"{label} Clean: {count}")
@@ -0,0 +1,42 @@
+import argparse
+from urllib.parse import urlparse
+from playwright.sync_api import sync_playwright
+
+from gemini_extractor import GEMINI_URL, CDP_URL, launch_context, check_login
+
+# Keeps one logged-in browser running between extraction runs.
+#
+# The browser is launched with the same profile and options as
+# gemini_extractor.py, plus a remote debugging port on this machine. Runs with
+# `gemini_extractor.py --cdp` attach to it over that port instead of launching
+# a browser and checking the login each time, and with --reuse-tabs they also
+# find the Gemini tabs of the previous run still open. Ctrl+C, or closing the
+# window, ends it.
+
+
+def serve(browser_channel, port):
+    with sync_playwright() as p:
+        context = launch_context(p, browser_channel, [f"--remote-debugging-port={port}"])
+        if context is None:
+            return
+        page = context.pages[0] if context.pages else context.new_page()
+        page.goto(GEMINI_URL, wait_until="domcontentloaded")
+        check_login(page, browser_channel)
+
+        url = f"http://127.0.0.1:{port}"
+        print(f"Browser ready at {url}. Extract with: python gemini_extractor.py --cdp {url} --reuse-tabs")
+        print("Press Ctrl+C here to close it.")
+        try:
+            context.wait_for_event("close", timeout=0)
+        except KeyboardInterrupt:
+            pass
+        print("Browser closed.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--browser", help="Browser channel (chrome, msedge)", default="chrome")
+    parser.add_argument("--port", type=int, default=urlparse(CDP_URL).port,
+                        help="Remote debugging port the extractor attaches to")
+    args = parser.parse_args()
+    serve(args.browser, args.port)
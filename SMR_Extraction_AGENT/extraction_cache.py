@@ -0,0 +1,71 @@
+import json
+import hashlib
+import sqlite3
+
+# Extracted values per PDF and column, keyed by the PDF's SHA-256 and a hash of
+# the column definition (label + description) they were extracted with.
+#
+# When a column is added or its description reworded, only that column's hash
+# changes: a rerun asks Gemini for just the new or changed columns of each
+# already extracted PDF and merges the answers with the cached values of the
+# others. PDFs extracted before the cache existed are seeded from their
+# journal row, taking the current definitions as the ones used.
+
+CACHE_FILE = 'extraction_cache.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fields (
+    sha256 TEXT,
+    column_label TEXT,
+    definition_hash TEXT,
+    value TEXT,
+    PRIMARY KEY (sha256, column_label)
+);
+"""
+
+
+def definition_hash(label, description):
+    return hashlib.sha256(f"{label}\0{description}".encode('utf-8')).hexdigest()[:16]
+
+
+def column_definitions(*sections):
+    # {label: definition hash} for the (label, description) lists given
+    return {label: definition_hash(label, desc) for section in sections for label, desc in section}
+
+
+class ExtractionCache:
+    def __init__(self, path=CACHE_FILE):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def fields(self, sha256):
+        # {label: (definition hash, value)}
+        rows = self.conn.execute("SELECT column_label, definition_hash, value FROM fields WHERE sha256 = ?", (sha256,))
+        return {label: (h, json.loads(value)) for label, h, value in rows}
+
+    def stale_columns(self, sha256, definitions):
+        # Labels that are missing or were extracted with another definition, in definition order
+        cached = self.fields(sha256)
+        return [label for label, h in definitions.items() if cached.get(label, (None,))[0] != h]
+
+    def store(self, sha256, values, definitions):
+        # values: {label: value} for the columns that were just extracted
+        self.conn.executemany("INSERT OR REPLACE INTO fields VALUES (?, ?, ?, ?)",
+                              [(sha256, label, definitions[label], json.dumps(values.get(label), ensure_ascii=False))
+                               for label in values if label in definitions])
+        self.conn.commit()
+
+    def seed(self, sha256, row, definitions):
+        # Journal row of a PDF extracted before the cache existed
+        if self.conn.execute("SELECT 1 FROM fields WHERE sha256 = ? LIMIT 1", (sha256,)).fetchone():
+            return
+        self.store(sha256, {label: row.get(label) for label in definitions}, definitions)
+
+    def merged_row(self, sha256, definitions):
+        # {label: value} of every current column from the cache
+        cached = self.fields(sha256)
+        return {label: cached[label][1] for label in definitions if label in cached}
@@ -0,0 +1,65 @@
+import os
+import json
+import pandas as pd
+
+# Append-only journal of extracted studies (JSON Lines, one study per line).
+#
+# Each study is appended and fsync'ed as soon as it is extracted, so nothing
+# is rewritten and a crash can at most leave a half-written last line, which
+# is skipped on reading. The Excel file is only an export: it is built from
+# the journal in one pass when a run ends (or with --export).
+
+
+def _ends_with_newline(path):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return True
+    with open(path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
+
+
+def append_rows(path, rows):
+    # Start on a fresh line if an interrupted write left the last one unfinished
+    prefix = '' if _ends_with_newline(path) else '\n'
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(prefix)
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_rows(path):
+    if not os.path.exists(path):
+        return []
+    rows = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError:
+                print(f"Warning: skipping unreadable line {number} of {path} (interrupted write?)")
+    return rows
+
+
+def import_excel(excel_path, path):
+    # One-time migration of a spreadsheet written by earlier versions
+    df = pd.read_excel(excel_path)
+    # Through to_json so numpy values become plain JSON and empty cells null
+    records = json.loads(df.to_json(orient='records', force_ascii=False))
+    rows = [{k: v for k, v in row.items() if v is not None} for row in records]
+    append_rows(path, rows)
+    return len(rows)
+
+
+def export_excel(path, excel_path, columns, select=None):
+    # The journal as a spreadsheet with the given columns, in extraction order
+    # select: picks the rows to export from all journal rows (e.g. the latest per PDF)
+    rows = read_rows(path)
+    if select:
+        rows = select(rows)
+    df = pd.DataFrame(rows, columns=columns)
+    df.to_excel(excel_path, index=False)
+    return len(rows)
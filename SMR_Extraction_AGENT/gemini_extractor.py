@@ -2,14 +2,39 @@
 import os
 import time
 import json
-import pandas as pd
 import argparse
+from collections import deque
 from playwright.sync_api import sync_playwright
 
+from extraction_journal import append_rows, read_rows, import_excel, export_excel
+from pdf_index import PdfIndex, INDEX_FILE, HASH_KEY, plan_files, latest_rows
+from extraction_cache import ExtractionCache, CACHE_FILE, column_definitions
+from pdf_preprocess import PdfText, PdfReader, TEXT_CACHE_FILE, MODES, prepare
+
 # Configuration
 ARTICLES_DIR = 'Articles'
 OUTPUT_FILE = 'extracted_studies.xlsx'
+JOURNAL_FILE = 'extracted_studies.jsonl'
 GEMINI_URL = "https://gemini.google.com/app"
+CDP_URL = "http://127.0.0.1:9222"  # where browser_daemon.py serves its browser
+
+# Waits follow the page state; these are only the ceilings (seconds)
+WAITS = {
+    'page': 30,        # prompt area visible after navigation
+    'login': 300,      # manual login on the first run
+    'upload': 120,     # attachment preview shown and its progress indicator gone
+    'response': 300,   # stop button gone and the response text stable
+    'stable': 2.0,     # how long the response text must stay unchanged
+}
+POLL_MS = 250
+
+# Selectors for the page states the waits look at
+PROMPT_AREA = "div[contenteditable='true'], textarea"
+FILE_PREVIEW = "uploader-file-preview, [data-test-id*='file-preview'], [class*='file-preview'], [class*='attachment']"
+UPLOAD_PROGRESS = "[role='progressbar'], mat-progress-spinner, mat-progress-bar, [class*='uploading']"
+STOP_BUTTON = "button[aria-label*='Stop']"
+RESPONSE = "model-response, .model-response-text"
+NEW_CHAT = "[data-test-id='new-chat-button'] button, button[aria-label*='New chat'], a[aria-label*='New chat']"
 
 # Column Definitions
 STUDY_CHARACTERISTICS = [
@@ -60,27 +85,106 @@ OUTCOMES = [
 ]
 
 ALL_COLUMNS = [c[0] for c in STUDY_CHARACTERISTICS] + [c[0] for c in OUTCOMES if c[0] != "Study ID"]
+DEFINITIONS = column_definitions(STUDY_CHARACTERISTICS, [c for c in OUTCOMES if c[0] != "Study ID"])
 
-def create_prompt():
-    prompt = "Extract the following information from the attached PDF. Return the result as a valid JSON object where keys are the 'Column Label' and values are the extracted text. If information is missing, use null.\n\n"
-    prompt += "--- Study Characteristics ---\n"
-    for label, desc in STUDY_CHARACTERISTICS:
-        prompt += f"- {label}: {desc}\n"
+def create_prompt(columns=None, article_text=None):
+    # columns: only ask for these labels (new or changed columns of a cached PDF)
+    # article_text: sent in the prompt instead of attaching the PDF (--preprocess text)
+    source = "article text below" if article_text else "attached PDF"
+    wanted = set(columns) if columns else None
+    characteristics = [(l, d) for l, d in STUDY_CHARACTERISTICS if wanted is None or l in wanted]
+    outcomes = [(l, d) for l, d in OUTCOMES if l != "Study ID" and (wanted is None or l in wanted)]
+
+    prompt = f"Extract the following information from the {source}. Return the result as a valid JSON object where keys are the 'Column Label' and values are the extracted text. If information is missing, use null.\n\n"
+    if characteristics:
+        prompt += "--- Study Characteristics ---\n"
+        for label, desc in characteristics:
+            prompt += f"- {label}: {desc}\n"
     
-    prompt += "\n--- Outcomes ---\n"
-    for label, desc in OUTCOMES:
-        if label == "Study ID": continue 
-        prompt += f"- {label}: {desc}\n"
+    if outcomes:
+        prompt += "\n--- Outcomes ---\n"
+        for label, desc in outcomes:
+            prompt += f"- {label}: {desc}\n"
     
-    prompt += "\n\nCRUCIAL: Verify the extracted data against the PDF one more time before outputting to ensure accuracy. Return ONLY the JSON object, no markdown formatting."
+    prompt += "\n\nCRUCIAL: Verify the extracted data against the " + ("article text" if article_text else "PDF") + " one more time before outputting to ensure accuracy. Return ONLY the JSON object, no markdown formatting."
+    if article_text:
+        prompt += "\n\n--- Article Text (abstract, methods, results and tables) ---\n" + article_text
     return prompt
 
-def extract_data_from_page(page, pdf_path, prompt_text):
-    print(f"[{os.path.basename(pdf_path)}] Navigating to Gemini...")
-    page.goto(GEMINI_URL)
-    time.sleep(5)
-    
-    # Upload Logic
+def is_visible(locator):
+    try:
+        return locator.count() > 0 and locator.first.is_visible()
+    except Exception:
+        return False
+
+# The extraction is written as step generators: every wait yields between two
+# polls instead of blocking. One tab drives its generator with run_steps; with
+# --tabs N, process_studies_in_tabs advances N of them in turn, so all
+# Playwright calls stay on the one thread the sync API allows.
+
+def poll(condition, timeout):
+    # Yields until condition() holds or timeout seconds pass; returns whether it held
+    deadline = time.monotonic() + timeout
+    while True:
+        if condition():
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        yield
+
+def pause(seconds):
+    # Step generator for a short fixed wait; the other tabs keep running meanwhile
+    yield from poll(lambda: False, seconds)
+
+def run_steps(page, steps):
+    # Runs a step generator to the end on a single tab and returns its result
+    while True:
+        try:
+            next(steps)
+        except StopIteration as e:
+            return e.value
+        page.wait_for_timeout(POLL_MS)
+
+def last_response_text(page):
+    responses = page.locator(RESPONSE)
+    count = responses.count()
+    return responses.nth(count - 1).inner_text() if count else ""
+
+def wait_for_upload(page, upload_path, timeout):
+    # Step generator: the attachment preview (or the uploaded file's name) shows up, then its progress indicator goes away
+    deadline = time.monotonic() + timeout
+    name = os.path.basename(upload_path)
+    shown = yield from poll(lambda: is_visible(page.locator(FILE_PREVIEW)) or
+                            is_visible(page.get_by_text(name)), timeout)
+    done = yield from poll(lambda: not is_visible(page.locator(UPLOAD_PROGRESS)),
+                           max(deadline - time.monotonic(), 0))
+    return shown and done
+
+def wait_for_response(page, previous_count, timeout, stable):
+    # Step generator, done when the model has started (stop button or a new response), the stop
+    # button is gone again and the response text has not changed for `stable` seconds
+    deadline = time.monotonic() + timeout
+    started = yield from poll(lambda: is_visible(page.locator(STOP_BUTTON)) or
+                              page.locator(RESPONSE).count() > previous_count, timeout)
+    if not started:
+        return False
+
+    state = {'text': None, 'since': time.monotonic()}
+    def finished():
+        text = last_response_text(page)
+        now = time.monotonic()
+        if text != state['text']:
+            state['text'], state['since'] = text, now
+            return False
+        return bool(text.strip()) and now - state['since'] >= stable and \
+            not is_visible(page.locator(STOP_BUTTON))
+    return (yield from poll(finished, max(deadline - time.monotonic(), 0)))
+
+def extract_data_from_page(page, pdf_path, prompt_text, attachment):
+    return run_steps(page, extract_steps(page, pdf_path, prompt_text, attachment))
+
+def upload_steps(page, pdf_path, attachment):
+    # Attaches the file through the upload menu; True once Gemini has it
     print(f"[{os.path.basename(pdf_path)}] Attempting upload...")
     try:
         # Robust Upload Logic with FileChooser
@@ -104,52 +208,88 @@ def extract_data_from_page(page, pdf_path, prompt_text):
                 print("Found Plus button.")
                 try:
                     plus_button.first.evaluate("el => el.style.border = '5px solid red'")
-                    time.sleep(0.5)
+                    yield from pause(0.5)
                     plus_button.first.click(force=True)
                 except:
                     plus_button.first.evaluate("el => el.click()")
                 
-                time.sleep(1)
-                
-                # Check for menu item
+                # Wait for the menu item to open rather than a fixed delay
                 menu_item = page.locator("div[role='menuitem']:has-text('Upload'), span:has-text('Upload'), li:has-text('Upload'), div:has-text('Upload a file')")
-                try:
-                    if menu_item.count() > 0:
-                        menu_item.first.wait_for(state="visible", timeout=3000)
+                clicked = False
+                if (yield from poll(lambda: is_visible(menu_item), 3)):
+                    try:
                         menu_item.first.click(force=True)
-                    else:
-                        print("Menu item not found, trying ArrowDown...")
-                        page.keyboard.press("ArrowDown")
-                        time.sleep(0.5)
-                        page.keyboard.press("Enter")
-                except:
+                        clicked = True
+                    except Exception:
+                        pass
+                if not clicked:
+                    print("Menu item not found, trying ArrowDown...")
                     page.keyboard.press("ArrowDown")
-                    time.sleep(0.5)
+                    yield from pause(0.5)
                     page.keyboard.press("Enter")
             else:
                  print("Could not find Plus button.")
                  page.screenshot(path="debug_no_plus.png")
-                 return None
+                 return False
         
         file_chooser = fc_info.value
-        file_chooser.set_files(pdf_path)
+        file_chooser.set_files(attachment)
         print(f"[{os.path.basename(pdf_path)}] File uploaded. Waiting for processing...")
-        time.sleep(10) # Wait for upload
+        started = time.monotonic()
+        if (yield from wait_for_upload(page, attachment, WAITS['upload'])):
+            print(f"[{os.path.basename(pdf_path)}] Upload ready after {time.monotonic() - started:.1f} s")
+        else:
+            print(f"[{os.path.basename(pdf_path)}] Upload not confirmed within {WAITS['upload']} s, continuing")
         
     except Exception as e:
         print(f"[{os.path.basename(pdf_path)}] Upload failed: {e}")
+        return False
+    return True
+
+def new_chat_steps(page, pdf_path):
+    # Step generator: a fresh chat with the prompt area ready. A warm tab that is still
+    # on Gemini starts it in place with the New chat button; a new tab, or one where
+    # that does not work, navigates to Gemini.
+    if page.url.startswith(GEMINI_URL) and is_visible(page.locator(NEW_CHAT)):
+        try:
+            page.locator(NEW_CHAT).first.click()
+            if (yield from poll(lambda: page.locator(RESPONSE).count() == 0 and
+                                is_visible(page.locator(PROMPT_AREA)), WAITS['page'])):
+                print(f"[{os.path.basename(pdf_path)}] New chat started in the open tab")
+                return True
+        except Exception as e:
+            print(f"[{os.path.basename(pdf_path)}] New chat button failed: {e}")
+    print(f"[{os.path.basename(pdf_path)}] Navigating to Gemini...")
+    page.goto(GEMINI_URL, wait_until="domcontentloaded")
+    return (yield from poll(lambda: is_visible(page.locator(PROMPT_AREA)), WAITS['page']))
+
+def extract_steps(page, pdf_path, prompt_text, attachment):
+    # attachment: the file to upload (the PDF or a trimmed copy), or None when
+    # the prompt already carries the article text
+    if not (yield from new_chat_steps(page, pdf_path)):
+        print(f"[{os.path.basename(pdf_path)}] Prompt area did not appear within {WAITS['page']} s")
+        return None
+    
+    if attachment is None:
+        print(f"[{os.path.basename(pdf_path)}] Sending the article text, nothing to upload")
+    elif not (yield from upload_steps(page, pdf_path, attachment)):
         return None
 
     # Prompting
     try:
-        text_area = page.locator("div[contenteditable='true'], textarea")
+        text_area = page.locator(PROMPT_AREA)
+        previous_count = page.locator(RESPONSE).count()
         text_area.first.fill(prompt_text)
-        time.sleep(1)
+        yield from pause(1)
         text_area.first.press("Enter")
         print(f"[{os.path.basename(pdf_path)}] Prompt sent. Waiting for response...")
         
-        # Wait for response
-        time.sleep(30) 
+        # Wait for the response to finish
+        started = time.monotonic()
+        if (yield from wait_for_response(page, previous_count, WAITS['response'], WAITS['stable'])):
+            print(f"[{os.path.basename(pdf_path)}] Response complete after {time.monotonic() - started:.1f} s")
+        else:
+            print(f"[{os.path.basename(pdf_path)}] Response not complete within {WAITS['response']} s, reading what is there")
         
         # Extract Response
         response_elements = page.locator("model-response, .model-response-text") 
@@ -175,11 +315,11 @@ def extract_data_from_page(page, pdf_path, prompt_text):
         print(f"[{os.path.basename(pdf_path)}] Interaction failed: {e}")
         return None
 
-def process_study_single_pass(context, pdf_path, prompt_text):
+def process_study_single_pass(context, pdf_path, prompt_text, attachment):
     print(f"\n--- Processing {os.path.basename(pdf_path)} ---")
     page = context.new_page()
     try:
-        data = extract_data_from_page(page, pdf_path, prompt_text)
+        data = extract_data_from_page(page, pdf_path, prompt_text, attachment)
         return [data] if data else []
     finally:
         # User requested "new tab" originally, but usually we close to save resources.
@@ -188,124 +328,237 @@ def process_study_single_pass(context, pdf_path, prompt_text):
         # Given 20 files, keeping 20 tabs might crash.
         page.close()
 
+def process_studies_in_tabs(context, jobs, tabs, save, warm=None):
+    # jobs: (pdf path, prompt, attachment) triples. Keeps up to `tabs` pages extracting at once,
+    # advancing their step generators in turn. A tab that fails or crashes only
+    # loses its own study, and every finished study goes through save() here,
+    # one at a time.
+    # warm: open tabs to reuse (--reuse-tabs). A tab is then kept after its study
+    # and the next one starts a new chat in it instead of opening a new page;
+    # only a tab that crashed is closed.
+    queue = deque(jobs)
+    active = []
+    while queue or active:
+        while queue and len(active) < tabs:
+            pdf_path, prompt_text, attachment = queue.popleft()
+            print(f"\n--- Processing {os.path.basename(pdf_path)} (tab {len(active) + 1} of {tabs}) ---")
+            try:
+                page = warm.pop() if warm else context.new_page()
+            except Exception as e:
+                print(f"[{os.path.basename(pdf_path)}] Could not open a tab: {e}")
+                continue
+            active.append((page, pdf_path, extract_steps(page, pdf_path, prompt_text, attachment)))
+
+        running = []
+        for page, pdf_path, steps in active:
+            try:
+                next(steps)
+                running.append((page, pdf_path, steps))
+                continue
+            except StopIteration as e:
+                data = e.value
+                reusable = warm is not None
+            except Exception as e:
+                print(f"[{os.path.basename(pdf_path)}] Tab failed: {e}")
+                data = None
+                reusable = False
+            if reusable:
+                warm.append(page)
+            else:
+                try:
+                    page.close()
+                except Exception:
+                    pass
+            save(pdf_path, [data] if data else [])
+        active = running
+        if active:
+            time.sleep(POLL_MS / 1000)
+
+def save_results(study_results):
+    # Appended to the journal (and fsync'ed) as soon as each study is done
+    if not study_results:
+        return
+    append_rows(JOURNAL_FILE, study_results)
+    print(f"Saved {len(study_results)} rows to {JOURNAL_FILE}")
+
+def export_results():
+    # A PDF re-asked for some columns has a newer, merged row; only that one is exported
+    count = export_excel(JOURNAL_FILE, OUTPUT_FILE, ['Source File'] + ALL_COLUMNS, select=latest_rows)
+    print(f"Exported {count} rows to {OUTPUT_FILE}")
+
+def launch_context(p, browser_channel, extra_args=()):
+    # Persistent profile, so the Gemini login is kept between runs
+    profile_name = f"{browser_channel}_profile"
+    user_data_dir = os.path.join(os.getcwd(), profile_name)
+    print(f"Launching {browser_channel} with profile: {user_data_dir}")
+    
+    try:
+        browser = p.chromium.launch_persistent_context(
+            user_data_dir, 
+            headless=False, 
+            channel=browser_channel, 
+            args=[
+                "--disable-blink-features=AutomationControlled",
+                "--start-maximized",
+                "--no-sandbox",
+                "--disable-infobars"
+            ] + list(extra_args),
+            ignore_default_args=["--enable-automation"],
+            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+        )
+        
+        if len(browser.pages) > 0:
+            page = browser.pages[0]
+        else:
+            page = browser.new_page()
+            
+        page.add_init_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+    except Exception as e:
+        print(f"Failed to launch {browser_channel}: {e}")
+        return None
+    return browser
+
+def check_login(page, browser_channel):
+    # A tab that is already on Gemini (e.g. in the daemon's browser) is not reloaded
+    if not page.url.startswith(GEMINI_URL):
+        page.goto(GEMINI_URL, wait_until="domcontentloaded")
+    
+    # Check if we are already logged in by looking for input area
+    try:
+        print("Checking login status...")
+        page.locator(PROMPT_AREA).first.wait_for(state="visible", timeout=WAITS['page'] * 1000)
+        print("Login confirmed (Prompt area found). Proceeding immediately.")
+    except:
+         print("Login verification failed (Prompt area not found). assuming need to log in.")
+         print(f"Please log in to Gemini in the opened {browser_channel} window. Waiting up to {WAITS['login']} seconds...")
+         try:
+             page.locator(PROMPT_AREA).first.wait_for(state="visible", timeout=WAITS['login'] * 1000)
+             print("Login confirmed. Proceeding.")
+         except:
+             print("Prompt area still not found. Continuing anyway.")
+
 def get_pdf_files():
     files = [f for f in os.listdir(ARTICLES_DIR) if f.lower().endswith('.pdf')]
     return [os.path.join(ARTICLES_DIR, f) for f in files]
 
-def main(limit=None, browser_channel="chrome"):
+def main(limit=None, browser_channel="chrome", tabs=1, preprocess=None, cdp=None, reuse_tabs=False):
     if not os.path.exists(ARTICLES_DIR):
         print(f"Error: Directory {ARTICLES_DIR} does not exist.")
         return
+    if preprocess and PdfReader is None:
+        print("Error: --preprocess needs pypdf (pip install pypdf).")
+        return
 
     pdf_files = get_pdf_files()
     
-    # Resume Skip Logic
-    if os.path.exists(OUTPUT_FILE):
+    if not os.path.exists(JOURNAL_FILE) and os.path.exists(OUTPUT_FILE):
+        # Results of runs before the journal existed
         try:
-            existing_df = pd.read_excel(OUTPUT_FILE)
-            if 'Source File' in existing_df.columns:
-                processed_files = set(existing_df['Source File'].dropna().astype(str).tolist())
-                # Normalize basenames for comparison
-                processed_basenames = {os.path.basename(f) for f in processed_files}
-                
-                # Filter out files whose basename matches processed files (or variants like "file (Run 2A)")
-                # Actually, our Source File just stores the basename or basename + suffix.
-                # A simple basename check might be best if we just strip suffixes.
-                # But 'A Fano 2025.pdf (Run 2A)' implies 'A Fano 2025.pdf' was processed.
-                
-                # Better approach: check if original filename is contained in any processed source file string
-                files_to_skip = []
-                for pf in pdf_files:
-                    basename = os.path.basename(pf)
-                    # Check if this basename appears in any recorded source file entry
-                    if any(basename in str(recorded) for recorded in processed_files):
-                        files_to_skip.append(pf)
-                
-                original_count = len(pdf_files)
-                pdf_files = [f for f in pdf_files if f not in files_to_skip]
-                print(f"Skipping {len(files_to_skip)} already processed files. {len(pdf_files)} remaining.")
+            print(f"Imported {import_excel(OUTPUT_FILE, JOURNAL_FILE)} rows from {OUTPUT_FILE} into {JOURNAL_FILE}")
         except Exception as e:
-            print(f"Warning: Could not read existing output file for resume logic: {e}")
+            print(f"Warning: Could not import existing output file: {e}")
+
+    # Resume Skip Logic: by content hash, so renamed and duplicate PDFs are caught too
+    index = PdfIndex(INDEX_FILE)
+    try:
+        new_files, hashes, done, duplicates = plan_files(pdf_files, read_rows(JOURNAL_FILE), index)
+    finally:
+        index.close()
+    for pdf, first in duplicates:
+        print(f"Skipping {os.path.basename(pdf)}: same content as {os.path.basename(first)}")
+    print(f"Hashed {index.hashed} new or changed PDFs ({len(hashes) - index.hashed} unchanged since the last run).")
+
+    # Extracted PDFs are only asked again for columns that are new or were reworded
+    cache = ExtractionCache(CACHE_FILE)
+    jobs = [(pdf, None) for pdf in new_files]
+    partial = 0
+    for pdf, row in done.items():
+        cache.seed(hashes[pdf], row, DEFINITIONS)
+        stale = cache.stale_columns(hashes[pdf], DEFINITIONS)
+        if stale:
+            jobs.append((pdf, stale))
+            partial += 1
+    print(f"Skipping {len(done) - partial} already processed files. "
+          f"{len(new_files)} new, {partial} need new or changed columns only.")
 
     if limit:
-        pdf_files = pdf_files[:int(limit)]
+        jobs = jobs[:int(limit)]
     
-    print(f"Found {len(pdf_files)} PDF files to process.")
+    print(f"Found {len(jobs)} PDF files to process.")
 
-    prompt_text = create_prompt()
-    all_results = []
+    # Local pre-processing: only the relevant text, or pages, go to Gemini
+    texts = {pdf: None for pdf, _ in jobs}
+    attachments = {pdf: pdf for pdf, _ in jobs}
+    if preprocess:
+        text_cache = PdfText(TEXT_CACHE_FILE)
+        try:
+            for pdf, _ in jobs:
+                try:
+                    texts[pdf], attachments[pdf], note = prepare(pdf, hashes[pdf], preprocess, text_cache)
+                    print(f"[{os.path.basename(pdf)}] {note}")
+                except Exception as e:
+                    print(f"[{os.path.basename(pdf)}] Pre-processing failed, uploading the whole PDF: {e}")
+        finally:
+            text_cache.close()
+        print(f"Parsed {text_cache.extracted} PDFs; the text of PDFs seen before came from {TEXT_CACHE_FILE}.")
+
+    prompts = {pdf: create_prompt(columns, texts[pdf]) for pdf, columns in jobs}
+    asked = {pdf: columns or list(DEFINITIONS) for pdf, columns in jobs}
 
     with sync_playwright() as p:
-        profile_name = f"{browser_channel}_profile"
-        user_data_dir = os.path.join(os.getcwd(), profile_name)
-        print(f"Launching {browser_channel} with profile: {user_data_dir}")
-        
-        try:
-            browser = p.chromium.launch_persistent_context(
-                user_data_dir, 
-                headless=False, 
-                channel=browser_channel, 
-                args=[
-                    "--disable-blink-features=AutomationControlled",
-                    "--start-maximized",
-                    "--no-sandbox",
-                    "--disable-infobars"
-                ],
-                ignore_default_args=["--enable-automation"],
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-            )
-            
-            if len(browser.pages) > 0:
-                page = browser.pages[0]
-            else:
-                page = browser.new_page()
-                
-            page.add_init_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-        except Exception as e:
-            print(f"Failed to launch {browser_channel}: {e}")
-            return
-        
+        if cdp:
+            # A browser kept running by browser_daemon.py: no launch, and usually already logged in
+            print(f"Attaching to the browser at {cdp}")
+            try:
+                browser = p.chromium.connect_over_cdp(cdp).contexts[0]
+            except Exception as e:
+                print(f"Could not attach to {cdp}: {e}")
+                print("Start the browser first with: python browser_daemon.py")
+                return
+        else:
+            browser = launch_context(p, browser_channel)
+            if browser is None:
+                return
+
         # Login Check
-        page = browser.pages[0]
-        page.goto(GEMINI_URL)
-        time.sleep(5)
-        
-        # Check if we are already logged in by looking for input area
-        try:
-            print("Checking login status...")
-            page.locator("div[contenteditable='true'], textarea").wait_for(state="visible", timeout=5000)
-            print("Login confirmed (Prompt area found). Proceeding immediately.")
-        except:
-             print("Login verification failed (Prompt area not found). assuming need to log in.")
-             print(f"Please log in to Gemini in the opened {browser_channel} window. Waiting 45 seconds...")
-             time.sleep(45)
+        page = browser.pages[0] if browser.pages else browser.new_page()
+        check_login(page, browser_channel)
+
+        def save(pdf_path, study_results):
+            # The asked columns go to the cache, and the journal gets the full row:
+            # new answers merged with the cached values of the other columns.
+            # Each study records the hash of its PDF for the resume logic.
+            rows = []
+            for data in study_results:
+                digest = hashes[pdf_path]
+                cache.store(digest, {c: data.get(c) for c in asked[pdf_path]}, DEFINITIONS)
+                row = {'Source File': data.get('Source File', os.path.basename(pdf_path))}
+                row.update(cache.merged_row(digest, DEFINITIONS))
+                row[HASH_KEY] = digest
+                rows.append(row)
+            save_results(rows)
 
         # Process Files
-        for pdf_path in pdf_files:
-            study_results = process_study_single_pass(browser, pdf_path, prompt_text)
-            
-            if study_results:
-                all_results.extend(study_results)
-                
-                # Save Incremental
-                df = pd.DataFrame(study_results)
-                # Align columns
-                for c in ALL_COLUMNS:
-                    if c not in df.columns: df[c] = None
-                
-                cols = ['Source File'] + [c for c in ALL_COLUMNS if c in df.columns]
-                df = df[cols]
-
-                if os.path.exists(OUTPUT_FILE):
-                    existing = pd.read_excel(OUTPUT_FILE)
-                    df = pd.concat([existing, df], ignore_index=True)
-                else:
-                    # If first write, ensure all columns are present for template structure if needed
-                    pass
-                
-                df.to_excel(OUTPUT_FILE, index=False)
-                print(f"Saved {len(study_results)} rows to {OUTPUT_FILE}")
+        try:
+            if reuse_tabs:
+                # Warm tabs: the login tab, plus Gemini tabs the daemon's browser kept from earlier runs
+                warm = [pg for pg in browser.pages if pg.url.startswith(GEMINI_URL)]
+                process_studies_in_tabs(browser, [(pdf, prompts[pdf], attachments[pdf]) for pdf, _ in jobs], tabs, save, warm)
+            elif tabs > 1:
+                process_studies_in_tabs(browser, [(pdf, prompts[pdf], attachments[pdf]) for pdf, _ in jobs], tabs, save)
+            else:
+                for pdf_path, _ in jobs:
+                    # Save Incremental
+                    save(pdf_path, process_study_single_pass(browser, pdf_path, prompts[pdf_path], attachments[pdf_path]))
+        finally:
+            # One write of the spreadsheet, even if the run is interrupted
+            export_results()
+            cache.close()
 
+        if cdp:
+            # Only disconnects; the daemon keeps the browser and its tabs for the next run
+            print("Done. The browser stays open in browser_daemon.py.")
+            return
         print("Done. Browser remains open.")
         time.sleep(5)
 
@@ -313,5 +566,26 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--limit", help="Limit number of files to process", default=None)
     parser.add_argument("--browser", help="Browser channel (chrome, msedge)", default="chrome")
+    parser.add_argument("--export", action="store_true",
+                        help=f"Only rebuild {OUTPUT_FILE} from {JOURNAL_FILE}, without opening the browser")
+    parser.add_argument("--tabs", type=int, default=1,
+                        help="Extract in N browser tabs at once (as many as the account tolerates)")
+    parser.add_argument("--upload-timeout", type=float, default=WAITS['upload'],
+                        help="Max seconds to wait for a PDF upload to finish")
+    parser.add_argument("--response-timeout", type=float, default=WAITS['response'],
+                        help="Max seconds to wait for Gemini to finish answering")
+    parser.add_argument("--stable-ms", type=int, default=int(WAITS['stable'] * 1000),
+                        help="Response counts as finished once its text is unchanged this long")
+    parser.add_argument("--preprocess", choices=MODES, default=None,
+                        help="Send only the relevant sections: as text in the prompt, or as a trimmed PDF (needs pypdf)")
+    parser.add_argument("--cdp", nargs="?", const=CDP_URL, default=None,
+                        help=f"Attach to the browser started by browser_daemon.py (default {CDP_URL}) instead of launching one")
+    parser.add_argument("--reuse-tabs", action="store_true",
+                        help="Keep each tab open and start a new chat in it for the next PDF")
     args = parser.parse_args()
-    main(limit=args.limit, browser_channel=args.browser)
+    WAITS.update(upload=args.upload_timeout, response=args.response_timeout, stable=args.stable_ms / 1000)
+    if args.export:
+        export_results()
+    else:
+        main(limit=args.limit, browser_channel=args.browser, tabs=args.tabs, preprocess=args.preprocess,
+             cdp=args.cdp, reuse_tabs=args.reuse_tabs)
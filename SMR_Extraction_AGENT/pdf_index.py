@@ -0,0 +1,122 @@
+import os
+import re
+import hashlib
+import sqlite3
+
+# SHA-256 of every PDF in Articles/, kept between runs.
+#
+# A file is only hashed again when its size or modification time changed, so
+# a rerun over hundreds of unchanged PDFs costs one stat() each. Studies in the
+# journal carry the hash of the PDF they came from, which makes "already
+# extracted?" a set lookup that also catches renamed files and duplicate
+# copies of the same paper.
+
+INDEX_FILE = 'pdf_index.db'
+HASH_KEY = 'SHA-256'
+CHUNK_SIZE = 1 << 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime_ns INTEGER,
+    sha256 TEXT
+);
+"""
+
+# "Smith 2020.pdf (Run 2A)" -> "smith 2020.pdf"
+RUN_SUFFIX = re.compile(r'^(.*?\.pdf)(?:\s*\(.*\))?\s*$', re.I)
+
+
+def sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def source_name(recorded):
+    # File name a journal row's Source File refers to, for rows written before hashes
+    recorded = os.path.basename(str(recorded).strip())
+    m = RUN_SUFFIX.match(recorded)
+    return (m.group(1) if m else recorded).lower()
+
+
+class PdfIndex:
+    def __init__(self, path=INDEX_FILE):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+        self.hashed = 0
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def sha256(self, path):
+        st = os.stat(path)
+        key = os.path.abspath(path)
+        row = self.conn.execute("SELECT size, mtime_ns, sha256 FROM files WHERE path = ?", (key,)).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return row[2]
+        digest = sha256_file(path)
+        self.hashed += 1
+        self.conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                          (key, st.st_size, st.st_mtime_ns, digest))
+        return digest
+
+
+def plan_files(pdf_files, rows, index):
+    # Returns (PDFs not extracted yet, {pdf: hash}, {pdf: its latest journal row}
+    # for the extracted ones, [(pdf, first copy)] for duplicate contents)
+    by_hash, by_name = {}, {}
+    for row in rows:
+        if row.get(HASH_KEY):
+            by_hash[row[HASH_KEY]] = row
+        elif row.get('Source File'):
+            # Rows from before the index only have a file name; match it exactly
+            by_name[source_name(row['Source File'])] = row
+    hashes = {}
+    first_copy = {}
+    new, done, duplicates = [], {}, []
+    for pdf in pdf_files:
+        digest = hashes[pdf] = index.sha256(pdf)
+        row = by_hash.get(digest) or by_name.get(os.path.basename(pdf).lower())
+        if digest in first_copy:
+            duplicates.append((pdf, first_copy[digest]))
+            continue
+        first_copy[digest] = pdf
+        if row is not None:
+            done[pdf] = row
+        else:
+            new.append(pdf)
+    return new, hashes, done, duplicates
+
+
+def latest_rows(rows):
+    # The rows to export: the last row for each PDF hash, in the place of its first.
+    # A row from before the hashes counts as the same PDF as a hashed row with
+    # its file name, as in plan_files, so the hashed row takes its place.
+    out = []
+    slots = {}
+    legacy = {}
+    for row in rows:
+        digest = row.get(HASH_KEY)
+        if not digest:
+            if row.get('Source File'):
+                legacy.setdefault(source_name(row['Source File']), []).append(len(out))
+            out.append(row)
+            continue
+        slot = slots.get(digest)
+        if slot is None:
+            replaced = legacy.pop(source_name(row.get('Source File', '')), [])
+            if replaced:
+                slot = replaced[0]
+                for extra in replaced[1:]:
+                    out[extra] = None
+            else:
+                slot = len(out)
+                out.append(None)
+            slots[digest] = slot
+        out[slot] = row
+    return [row for row in out if row is not None]
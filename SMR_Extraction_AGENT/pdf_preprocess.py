@@ -0,0 +1,145 @@
+import os
+import re
+import sqlite3
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:
+    PdfReader = PdfWriter = None
+
+# Local pre-processing of the PDFs before they go to Gemini (--preprocess).
+#
+# The text of every page is extracted with pypdf and kept in pdf_text.db by
+# the PDF's SHA-256, so each paper is parsed once. The lines are then sorted
+# into sections by their headings. Only the front matter (title, authors,
+# journal), abstract, methods, results, conclusion and tables are sent, either
+# pasted into the prompt as text or as a PDF trimmed to the pages that hold
+# them. Introduction, discussion, references, acknowledgements and
+# supplements stay behind. A PDF with too little text (a scan) or no
+# recognisable headings is uploaded whole, as before.
+
+TEXT_CACHE_FILE = 'pdf_text.db'
+TRIMMED_DIR = 'trimmed_pdfs'
+MODES = ('text', 'trim')
+RELEVANT = ('front', 'abstract', 'methods', 'results', 'conclusion', 'table')
+MIN_TEXT = 2000  # characters of relevant text, below that the whole PDF is sent
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    sha256 TEXT,
+    page INTEGER,
+    text TEXT,
+    PRIMARY KEY (sha256, page)
+);
+"""
+
+HEADINGS = [
+    ('abstract', r'abstract|summary'),
+    ('introduction', r'introduction'),
+    ('methods', r'(?:(?:materials?|patients?|subjects?)\s+and\s+)?methods?|methodology|study\s+design'),
+    ('results', r'results?|findings'),
+    ('discussion', r'discussion'),
+    ('conclusion', r'conclusions?'),
+    ('references', r'references|bibliography|literature\s+cited'),
+    ('back', r'acknowledge?ments?|funding|conflicts?\s+of\s+interest|disclosures?|author\s+contributions?'),
+    ('supplement', r'supplementary\s+(?:materials?|data|files?)|supplemental\s+(?:materials?|digital\s+content)|appendix|appendices'),
+]
+
+# A heading is a line of its own ("2. Materials and Methods"), or starts a
+# paragraph followed by ':' or '.' as in structured abstracts ("Results: ...")
+HEADING = re.compile(r'^\s*(?:\d+(?:\.\d+)*\.?|[IVX]+\.)?\s*(?:%s)\s*(?:[:.].*)?$' %
+                     '|'.join(f'(?P<{name}>{pattern})' for name, pattern in HEADINGS), re.I)
+TABLE = re.compile(r'^\s*table\s+(?:\d+|[IVX]+)\b', re.I)
+
+
+def extract_pages(pdf_path):
+    reader = PdfReader(pdf_path)
+    return [page.extract_text() or '' for page in reader.pages]
+
+
+class PdfText:
+    def __init__(self, path=TEXT_CACHE_FILE):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+        self.extracted = 0
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def pages(self, pdf_path, sha256):
+        rows = self.conn.execute("SELECT text FROM pages WHERE sha256 = ? ORDER BY page", (sha256,)).fetchall()
+        if rows:
+            return [text for (text,) in rows]
+        pages = extract_pages(pdf_path)
+        self.extracted += 1
+        self.conn.executemany("INSERT OR REPLACE INTO pages VALUES (?, ?, ?)",
+                              [(sha256, n, text) for n, text in enumerate(pages)])
+        self.conn.commit()
+        return pages
+
+
+def sections(pages):
+    # [(page number, section, text)], consecutive lines of one section on a page joined
+    chunks = []
+    section = 'front'
+    for number, text in enumerate(pages, 1):
+        for line in text.splitlines():
+            m = HEADING.match(line)
+            if m:
+                section = m.lastgroup
+            elif TABLE.match(line):
+                section = 'table'
+            if chunks and chunks[-1][0] == number and chunks[-1][1] == section:
+                chunks[-1][2].append(line)
+            else:
+                chunks.append((number, section, [line]))
+    return [(number, section, '\n'.join(lines)) for number, section, lines in chunks]
+
+
+def relevant_text(chunks):
+    parts = []
+    page = None
+    for number, section, text in chunks:
+        if section not in RELEVANT or not text.strip():
+            continue
+        if number != page:
+            parts.append(f"[Page {number}]")
+            page = number
+        parts.append(text.strip())
+    return '\n'.join(parts)
+
+
+def trim_pdf(pdf_path, page_numbers, out_path):
+    reader = PdfReader(pdf_path)
+    writer = PdfWriter()
+    for number in page_numbers:
+        writer.add_page(reader.pages[number - 1])
+    with open(out_path, 'wb') as f:
+        writer.write(f)
+
+
+def prepare(pdf_path, sha256, mode, text_cache):
+    # Returns (text to paste into the prompt or None, file to upload or None, note for the log)
+    pages = text_cache.pages(pdf_path, sha256)
+    chunks = sections(pages)
+    text = relevant_text(chunks)
+    found = {section for _, section, _ in chunks}
+    if len(text) < MIN_TEXT or found <= {'front', 'table'}:
+        return None, pdf_path, f"{len(pages)} pages, no usable text or headings, uploading the whole PDF"
+    if mode == 'text':
+        return text, None, f"{len(pages)} pages, sending {len(text)} of {sum(map(len, pages))} characters as text"
+
+    kept = sorted({number for number, section, chunk in chunks if section in RELEVANT and chunk.strip()})
+    if len(kept) == len(pages):
+        return None, pdf_path, f"{len(pages)} pages, all relevant, uploading the whole PDF"
+    # One folder per PDF hash, and the original file name inside it: the upload
+    # check looks for that name, and Gemini shows a meaningful one
+    out_dir = os.path.join(TRIMMED_DIR, sha256)
+    os.makedirs(out_dir, exist_ok=True)
+    out_path = os.path.join(out_dir, os.path.basename(pdf_path))
+    if not os.path.exists(out_path):
+        # Written under another name first, so an interrupted run leaves no half file behind
+        trim_pdf(pdf_path, kept, out_path + '.part')
+        os.replace(out_path + '.part', out_path)
+    return None, out_path, f"uploading {len(kept)} of {len(pages)} pages"
@@ -0,0 +1,90 @@
+import re
+
+# Keyword search used by screen_articles.
+#
+# Keywords only match whole words ("C1" does not match "C10" or "SC1"); a
+# trailing * allows any word ending, e.g. "LYMPHOMA*" also matches
+# "LYMPHOMAS". Rules only ask about the groups they need, one group at a
+# time, so each group is searched on its own.
+#
+# For groups of the size used in criteria.json, plain substring searches (C
+# speed) are faster than a regex scan in CPython, so each keyword is located
+# with str.find and only its occurrences are checked for word boundaries.
+# Groups of more than SCAN_MIN_KEYWORDS are searched with one regex per group
+# instead, factored as a trie so shared prefixes are tested once.
+
+PREFIX, WORD = "prefix", "word"
+SCAN_MIN_KEYWORDS = 32
+
+
+def trie_pattern(keywords):
+    # One regex for all keywords, e.g. C(?:1(?!\w)|ERVICAL) for C1 and CERVICAL*
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for ch in keyword.rstrip('*'):
+            node = node.setdefault(ch, {})
+        kind = PREFIX if keyword.endswith('*') else WORD
+        # A prefix keyword makes the word form of the same keyword redundant
+        if node.get('') != PREFIX:
+            node[''] = kind
+
+    def build(node):
+        if node.get('') == PREFIX:
+            return ''
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if node.get('') == WORD:
+            alts.append(r'(?!\w)')
+        if len(alts) == 1:
+            return alts[0]
+        return '(?:' + '|'.join(alts) + ')'
+
+    return build(trie)
+
+
+def compile_keywords(keywords):
+    # \b is much faster than a lookbehind for scanning; it is the same left
+    # boundary when every keyword starts with a word character
+    start = r'\b' if all(re.match(r'\w', k) for k in keywords) else r'(?<!\w)'
+    return re.compile(start + trie_pattern(keywords))
+
+
+def is_word_char(ch):
+    return ch.isalnum() or ch == '_'
+
+
+def find_word(text, literal, word=True):
+    # True if literal occurs in text at a word start (and, if word, at a word end),
+    # the same boundaries as compile_keywords
+    i = text.find(literal)
+    while i != -1:
+        end = i + len(literal)
+        if (i == 0 or not is_word_char(text[i - 1])) and \
+           (not word or end == len(text) or not is_word_char(text[end])):
+            return True
+        i = text.find(literal, i + 1)
+    return False
+
+
+class KeywordMatcher:
+    def __init__(self, groups):
+        # groups: {group name: [keywords]}
+        self.groups = {name: list(keywords) for name, keywords in groups.items()}
+        # Trie regex per large group (small groups use the substring search)
+        self.group_patterns = {name: compile_keywords(keywords)
+                               for name, keywords in self.groups.items() if len(keywords) > SCAN_MIN_KEYWORDS}
+        # (text, whole word?) per keyword, for the substring search
+        self.group_literals = {name: [(k.rstrip('*'), not k.endswith('*')) for k in keywords]
+                               for name, keywords in self.groups.items() if keywords}
+
+    def has(self, text, group):
+        # Whether any keyword of one group occurs in text
+        literals = self.group_literals.get(group)
+        if not text or not literals:
+            return False
+        if len(literals) > SCAN_MIN_KEYWORDS:
+            return self.group_patterns[group].search(text) is not None
+        for literal, word in literals:
+            if literal in text and find_word(text, literal, word):
+                return True
+        return False
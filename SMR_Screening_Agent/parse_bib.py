@@ -1,38 +1,72 @@
-import re
+import sys
 import json
 import os
+import mmap
+import argparse
+
+# The BibTeX tokenizer is shared with the deduplication agent. Its folder is found
+# from this file's location (not the working directory), and appended to the path
+# so that this agent's own modules always take precedence.
+DDUP_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'SMR_DDup_agent')
+if os.path.normpath(DDUP_DIR) not in map(os.path.normpath, sys.path):
+    sys.path.append(os.path.normpath(DDUP_DIR))
+try:
+    from bibtex_tokenizer import iter_entries
+except ImportError:
+    raise ImportError(f"parse_bib.py needs bibtex_tokenizer.py from {os.path.normpath(DDUP_DIR)}; "
+                      "keep the SMR_Screening_Agent and SMR_DDup_agent folders side by side")
+
+FIELDS = ['title', 'abstract', 'journal', 'year', 'author', 'doi']
+
+def field_text(raw):
+    # Same text the old text-mode read produced (universal newlines), on one line
+    text = raw.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+    return text.strip().replace('\n', ' ')
+
+def parse_entry(entry):
+    entry_data = {'key': entry.key}
+    for field in FIELDS:
+        value = entry.get(field)
+        entry_data[field] = field_text(value) if value is not None else ""
+    return entry_data
+
+def iter_bib(file_path):
+    # Streaming version of parse_bib: one entry at a time, every entry type
+    # (@article, @inproceedings, @misc, ...), one linear pass over a memory map
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for entry in iter_entries(mm):
+                yield parse_entry(entry)
 
 def parse_bib(file_path):
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Split by entries
-    entries = re.split(r'@article\{', content)[1:]
-    parsed_entries = []
-    
+    return list(iter_bib(file_path))
+
+def write_jsonl(entries, out):
+    count = 0
     for entry in entries:
-        lines = entry.split('\n')
-        key = lines[0].strip().rstrip(',')
-        
-        entry_data = {'key': key}
-        
-        # Simple regex for fields
-        fields = ['title', 'abstract', 'journal', 'year', 'author', 'doi']
-        for field in fields:
-            match = re.search(rf'{field}=\{{(.*?)\}}', entry, re.DOTALL | re.IGNORECASE)
-            if match:
-                entry_data[field] = match.group(1).strip().replace('\n', ' ')
-            else:
-                entry_data[field] = ""
-        
-        parsed_entries.append(entry_data)
-    
-    return parsed_entries
+        out.write(json.dumps(entry) + '\n')
+        count += 1
+    return count
 
 if __name__ == "__main__":
-    file_path = 'articles.bib'
+    parser = argparse.ArgumentParser()
+    parser.add_argument("file_path", nargs="?", default='articles.bib', help="BibTeX file to parse")
+    parser.add_argument("--jsonl", metavar="PATH",
+                        help="Stream entries as JSON Lines to PATH ('-' for stdout, e.g. piped into screen_articles.py --input -)")
+    args = parser.parse_args()
+
+    file_path = args.file_path
     if not os.path.exists(file_path):
-        print(f"Error: {file_path} not found.")
+        print(f"Error: {file_path} not found.", file=sys.stderr if args.jsonl == '-' else sys.stdout)
+    elif args.jsonl == '-':
+        count = write_jsonl(iter_bib(file_path), sys.stdout)
+        print(f"Parsed {count} articles", file=sys.stderr)
+    elif args.jsonl:
+        with open(args.jsonl, 'w', encoding='utf-8') as f:
+            count = write_jsonl(iter_bib(file_path), f)
+        print(f"Parsed {count} articles saved to {args.jsonl}")
     else:
         data = parse_bib(file_path)
         with open('parsed_articles.json', 'w', encoding='utf-8') as f:
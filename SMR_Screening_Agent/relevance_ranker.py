@@ -0,0 +1,341 @@
+import os
+import re
+import csv
+import sys
+import math
+import time
+import heapq
+import random
+import argparse
+from collections import Counter
+
+from screen_articles import read_articles, FIELDNAMES, INPUT_FILE, OUTPUT_FILE
+
+# Active-learning ranking of screening results for the human reviewers.
+#
+# Every article becomes a sparse TF-IDF vector over its title and abstract
+# words (title words get their own features, so "GCT" in a title counts for
+# more than in an abstract). A logistic regression trained with stochastic
+# gradient descent turns the vector into an inclusion probability. Each label
+# is a single gradient step that only touches the features of the labelled
+# article, and the scores of the other articles are patched through an
+# inverted index, so a label costs milliseconds.
+#
+# Patching is only cheap for rare words. Words found in more than MAX_DF of
+# the articles are dropped (after IDF they carry almost no signal). Changes to
+# the weights of the remaining common words (in more than LAZY_DF of the
+# articles) are batched, and each label folds the largest of them into the
+# scores until FOLD_BUDGET index entries are spent. The next article is the
+# best of the TOP_CANDIDATES highest stale scores, rescored exactly, and the
+# probabilities, ranking and recall estimate are always exact.
+#
+# Reviewer labels come from the Label column of the results CSV (Include or
+# Exclude). Until there are any, the keyword decisions of screen_articles.py
+# are used as weak labels to give a first ranking.
+
+RANKED_FILE = 'screening_ranked.csv'
+RANKED_FIELDNAMES = FIELDNAMES + ["Label", "Probability"]
+LABELS = {'include': 1, 'i': 1, 'exclude': 0, 'e': 0}
+WEAK_LABEL_WEIGHT = 0.2
+EPOCHS = 5
+MAX_DF = 0.5
+MAX_DF_MIN_ARTICLES = 100  # smaller sets keep every word
+LAZY_DF = 0.01
+FOLD_BUDGET = 20000
+TOP_CANDIDATES = 50
+
+WORD = re.compile(r'[a-z0-9]+')
+STOPWORDS = set("""a an and are as at be by for from has have in is it its of on or
+that the their this to was were which with we our these those not""".split())
+
+
+def tokens(text):
+    return [w for w in WORD.findall(text.lower()) if w not in STOPWORDS and len(w) > 1]
+
+
+def vectorize(articles, max_df=MAX_DF):
+    # Sublinear TF-IDF, L2-normalised: a list of [(feature id, value)] per article.
+    # Words in more than max_df of the articles are left out.
+    counts = []
+    df = Counter()
+    for art in articles:
+        tf = Counter('t:' + w for w in tokens(art.get('title') or ''))
+        tf.update(tokens(art.get('abstract') or ''))
+        counts.append(tf)
+        df.update(tf.keys())
+
+    n = len(counts)
+    too_common = max_df * n if n >= MAX_DF_MIN_ARTICLES else n
+    vocabulary = {}
+    vectors = []
+    for tf in counts:
+        vec = []
+        for term, count in tf.items():
+            if df[term] > too_common:
+                continue
+            fid = vocabulary.setdefault(term, len(vocabulary))
+            idf = math.log((1 + n) / (1 + df[term])) + 1
+            vec.append((fid, (1 + math.log(count)) * idf))
+        norm = math.sqrt(sum(v * v for _, v in vec)) or 1.0
+        vectors.append([(fid, v / norm) for fid, v in vec])
+    return vectors, len(vocabulary)
+
+
+def sigmoid(z):
+    if z < -30:
+        return 0.0
+    if z > 30:
+        return 1.0
+    return 1 / (1 + math.exp(-z))
+
+
+class RelevanceModel:
+    # Logistic regression with L2 decay. The weights are stored as scale * v,
+    # so decaying all of them is a single multiplication of scale.
+    def __init__(self, n_features, learning_rate=0.5, l2=1e-4):
+        self.v = [0.0] * n_features
+        self.scale = 1.0
+        self.bias = 0.0
+        self.learning_rate = learning_rate
+        self.l2 = l2
+
+    def dot(self, vec):
+        v = self.v
+        return sum(v[fid] * x for fid, x in vec)
+
+    def probability(self, vec):
+        return sigmoid(self.scale * self.dot(vec) + self.bias)
+
+    def learn(self, vec, y, weight=1.0):
+        # One SGD step; returns the [(feature id, change in v)] it made
+        error = (self.probability(vec) - y) * weight
+        lr = self.learning_rate
+        if self.scale < 1e-6:
+            self._rescale()
+        self.scale *= 1 - lr * self.l2
+        step = lr * error / self.scale
+        changes = []
+        for fid, x in vec:
+            delta = -step * x
+            self.v[fid] += delta
+            changes.append((fid, delta))
+        self.bias -= lr * error
+        return changes
+
+    def _rescale(self):
+        self.v = [w * self.scale for w in self.v]
+        self.scale = 1.0
+
+
+class Ranker:
+    def __init__(self, articles, rows):
+        # articles and rows are parallel lists; rows are the results CSV rows
+        self.rows = rows
+        self.vectors, n_features = vectorize(articles)
+        self.model = RelevanceModel(n_features)
+        self.labels = [LABELS.get((row.get('Label') or '').strip().lower()) for row in rows]
+        self.postings = [[] for _ in range(n_features)]
+        for i, vec in enumerate(self.vectors):
+            for fid, x in vec:
+                self.postings[fid].append((i, x))
+        self.dots = [0.0] * len(rows)
+        # Features whose weight changes are batched in pending: {feature id: change in v}
+        self.lazy = [len(p) > LAZY_DF * len(rows) for p in self.postings]
+        self.pending = {}
+        self.weak = False
+        self.seed = 0
+
+    def has_both_classes(self):
+        return {0, 1} <= set(self.labels)
+
+    def train(self, seed=0):
+        # Full (re)training from the reviewer labels
+        self.seed = seed
+        rng = random.Random(seed)
+        self.model = RelevanceModel(len(self.postings))
+        labelled = [(i, y, 1.0) for i, y in enumerate(self.labels) if y is not None]
+        self.weak = not self.has_both_classes()
+        if self.weak:
+            # Not both classes labelled yet: start from the keyword decisions
+            labelled += [(i, int(row['Decision'] == 'Include'), WEAK_LABEL_WEIGHT)
+                         for i, row in enumerate(self.rows) if self.labels[i] is None]
+        for _ in range(EPOCHS):
+            rng.shuffle(labelled)
+            for i, y, weight in labelled:
+                self.model.learn(self.vectors[i], y, weight)
+        self.dots = [self.model.dot(vec) for vec in self.vectors]
+        self.pending = {}
+
+    def label(self, i, y):
+        # Records a reviewer label and updates every score incrementally
+        self.labels[i] = y
+        self.rows[i]['Label'] = "Include" if y else "Exclude"
+        if self.weak and self.has_both_classes():
+            # The first Include and Exclude labels replace the keyword decisions
+            self.train(self.seed)
+            return
+        old_scale = self.model.scale
+        changes = self.model.learn(self.vectors[i], y)
+        if self.model.scale > old_scale:
+            # The model folded its scale into the weights
+            self.dots = [d * old_scale for d in self.dots]
+            self.pending = {fid: d * old_scale for fid, d in self.pending.items()}
+        dots = self.dots
+        pending = self.pending
+        for fid, delta in changes:
+            if self.lazy[fid]:
+                pending[fid] = pending.get(fid, 0.0) + delta
+                continue
+            for j, x in self.postings[fid]:
+                dots[j] += delta * x
+        self.fold(FOLD_BUDGET)
+
+    def fold(self, budget=None):
+        # Folds batched changes into every score, largest first, until budget
+        # index entries are spent (all of them without a budget)
+        dots = self.dots
+        pending = self.pending
+        spent = 0
+        for fid in sorted(pending, key=lambda f: abs(pending[f]), reverse=True):
+            if budget is not None and spent >= budget:
+                break
+            delta = pending.pop(fid)
+            for j, x in self.postings[fid]:
+                dots[j] += delta * x
+            spent += len(self.postings[fid])
+
+    def score(self, i):
+        # Exact dot product, including the batched changes
+        pending = self.pending
+        if not pending:
+            return self.dots[i]
+        return self.dots[i] + sum(pending.get(fid, 0.0) * x for fid, x in self.vectors[i])
+
+    def probability(self, i):
+        return sigmoid(self.model.scale * self.score(i) + self.model.bias)
+
+    def unlabelled(self):
+        return [i for i, y in enumerate(self.labels) if y is None]
+
+    def next_article(self):
+        candidates = self.unlabelled()
+        if not candidates:
+            return None
+        if not self.pending:
+            return max(candidates, key=self.dots.__getitem__)
+        # The batched changes are small next to the scores: rescore the front runners
+        top = heapq.nlargest(TOP_CANDIDATES, candidates, key=self.dots.__getitem__)
+        return max(top, key=self.score)
+
+    def ranking(self):
+        # Unlabelled articles by inclusion probability, then the labelled ones
+        self.fold()
+        order = sorted(self.unlabelled(), key=self.dots.__getitem__, reverse=True)
+        return order + [i for i, y in enumerate(self.labels) if y is not None]
+
+    def recall_estimate(self):
+        # Includes found by the reviewers against those still expected among the
+        # unlabelled articles (the sum of their probabilities). Only a rough
+        # guide: read it together with the run of excludes since the last include.
+        # None while the model still relies on the keyword decisions.
+        if self.weak:
+            return None
+        self.fold()
+        found = sum(1 for y in self.labels if y == 1)
+        expected = sum(self.probability(i) for i in self.unlabelled())
+        recall = found / (found + expected) if found + expected else 0.0
+        return found, expected, recall
+
+
+def load_rows(results_path, articles_path):
+    # Results CSV rows with the matching parsed article (title and abstract)
+    with open(results_path, 'r', newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    articles = list(read_articles(articles_path)) if os.path.exists(articles_path) else []
+    by_key = {}
+    for art in articles:
+        by_key.setdefault(art['key'], art)
+    matched = []
+    for i, row in enumerate(rows):
+        # The results are in input order, so match by position when the keys agree
+        if i < len(articles) and articles[i]['key'] == row['Key']:
+            matched.append(articles[i])
+        else:
+            matched.append(by_key.get(row['Key'], {'title': row['Title']}))
+    return rows, matched
+
+
+def write_ranking(ranker, path):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=RANKED_FIELDNAMES, extrasaction='ignore')
+        writer.writeheader()
+        for i in ranker.ranking():
+            row = dict(ranker.rows[i])
+            row['Label'] = row.get('Label') or ""
+            row['Probability'] = f"{ranker.probability(i):.4f}"
+            writer.writerow(row)
+
+
+def print_recall(ranker, since_include):
+    labelled = sum(1 for y in ranker.labels if y is not None)
+    estimate = ranker.recall_estimate()
+    if estimate is None:
+        print(f"Labelled {labelled} of {len(ranker.labels)}. Recall can be estimated once "
+              f"both Include and Exclude labels exist (ranked by the keyword decisions until then).")
+        return
+    found, expected, recall = estimate
+    print(f"Labelled {labelled} of {len(ranker.labels)} ({found} included). "
+          f"Estimated includes left unlabelled: {expected:.1f}, estimated recall: {recall:.1%}"
+          + (f", {since_include} excludes since the last include" if since_include is not None else ""))
+
+
+def review(ranker, count):
+    # Terminal review of the top-ranked article, one label at a time
+    since_include = 0
+    timings = []
+    for _ in range(count):
+        i = ranker.next_article()
+        if i is None:
+            break
+        row = ranker.rows[i]
+        print(f"\n[{ranker.probability(i):.3f}] {row['Title']}  ({row['Key']}, rules: {row['Decision']})")
+        answer = input("(i)nclude / (e)xclude / (q)uit: ").strip().lower()
+        if answer not in LABELS:
+            break
+        start = time.perf_counter()
+        ranker.label(i, LABELS[answer])
+        timings.append(time.perf_counter() - start)
+        since_include = 0 if LABELS[answer] else since_include + 1
+    if timings:
+        print(f"\nModel update: {1000 * sum(timings) / len(timings):.1f} ms per label on average")
+    return since_include
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank screening results by inclusion probability")
+    parser.add_argument("--results", default=OUTPUT_FILE,
+                        help="Screening results CSV; reviewer labels go in its Label column (Include/Exclude)")
+    parser.add_argument("--input", default=INPUT_FILE,
+                        help="Parsed articles (JSON array or .jsonl) for the abstracts")
+    parser.add_argument("--output", default=RANKED_FILE,
+                        help="Ranked CSV, with the Label and Probability columns")
+    parser.add_argument("--review", type=int, default=0, metavar="N",
+                        help="Label up to N top-ranked articles in the terminal, re-ranking after each one")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.results):
+        print(f"Error: {args.results} not found. Run screen_articles.py first.")
+        sys.exit(1)
+
+    rows, articles = load_rows(args.results, args.input)
+    start = time.perf_counter()
+    ranker = Ranker(articles, rows)
+    ranker.train(args.seed)
+    print(f"Trained on {sum(1 for y in ranker.labels if y is not None)} labels "
+          f"over {len(rows)} articles in {time.perf_counter() - start:.2f} s")
+
+    since_include = review(ranker, args.review) if args.review else None
+    write_ranking(ranker, args.output)
+    print_recall(ranker, since_include)
+    print(f"Ranking saved to {args.output}")
@@ -1,78 +1,177 @@
+import os
+import sys
 import json
 import csv
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-def screen_articles(json_path):
-    with open(json_path, 'r', encoding='utf-8') as f:
-        articles = json.load(f)
-    
-    results = []
-    for art in articles:
-        title = art.get('title', '').upper()
-        abstract = art.get('abstract', '').upper()
-        
-        # Exact GCT keywords
-        gct_keywords = ["GIANT CELL TUMOR", "GIANT-CELL TUMOR", "GIANT CELL TUMOUR", "GIANT-CELL TUMOUR", "OSTEOCLASTOMA"]
-        
-        # Check if GCT is the main topic (usually in title)
-        is_gct_in_title = any(x in title for x in gct_keywords)
-        is_gct_in_abstract = any(x in abstract for x in gct_keywords)
-        
-        # Check for other competing tumor types in title
-        competing_diagnosis = any(x in title for x in ["OSTEOBLASTOMA", "ANEURYSMAL BONE CYST", "METASTASIS", "METASTASES", "LYMPHOMA", "CHORDOMA", "PLASMACYTOMA"])
-        # Exception: if title has GCT AND metastases (like case 1)
-        if is_gct_in_title and "METASTAS" in title:
-            competing_diagnosis = False
-            
-        # Refined GCT check
-        is_gct = is_gct_in_title or (is_gct_in_abstract and not competing_diagnosis)
-        
-        # Cervical Spine check
-        cervical_keywords = ["CERVICAL", "C1", "C2", "C3", "C4", "C5", "C6", "C7", "ATLANTOAXIAL"]
-        is_cervical_in_title = any(x in title for x in cervical_keywords)
-        is_cervical_in_abstract = any(x in abstract for x in cervical_keywords)
-        is_cervical = is_cervical_in_title or is_cervical_in_abstract
+from screening_rules import Criteria
+from screening_cache import ScreeningCache
+from screening_stats import ScreeningStats, write_summary, print_summary
+
+CRITERIA_FILE = 'criteria.json'
+INPUT_FILE = 'parsed_articles.json'
+OUTPUT_FILE = 'screening_results.csv'
+CACHE_FILE = 'screening_cache.db'
+FIELDNAMES = ["Key", "Title", "Decision", "Reason"]
+CHUNK_SIZE = 1000
 
-        # ONLY BONE GCT
-        # Exclude Synovial or Tenosynovial types
-        is_non_bone = any(x in title for x in ["SYNOVIAL", "TENOSYNOVIAL"]) or \
-                       any(x in abstract for x in ["SYNOVIAL", "TENOSYNOVIAL"])
-        
-        # Exclusion criteria - Types
-        is_review = any(x in title for x in ["SYSTEMATIC REVIEW", "META-ANALYSIS", "NARRATIVE REVIEW", "LITERATURE REVIEW"]) or \
-                    (title.startswith("REVIEW") or " REVIEW " in title or title.endswith("REVIEW"))
-        
-        # Decision logic
-        decision = "Exclude"
-        reason = ""
-        
-        if not is_gct:
-            reason = "Not GCT/Osteoclastoma or primary topic is another tumor type"
-        elif is_non_bone:
-            reason = "Non-bone origin (Synovial/Tenosynovial)"
-        elif not is_cervical:
-            reason = "Not Cervical Spine"
-        elif is_review:
-            reason = "Review/Meta-Analysis/Systematic Review"
-        else:
-            decision = "Include"
-            reason = "Original article on Cervical Bone GCT/Osteoclastoma"
+_criteria = None
+_cache = None
+_stats = None
 
-        results.append({
+def read_articles(path):
+    # parsed_articles.json (a JSON array) is loaded whole; JSON Lines files and
+    # '-' (stdin, e.g. piped from parse_bib.py --jsonl -) are read one line at a time
+    if path == '-':
+        for line in sys.stdin:
+            if line.strip():
+                yield json.loads(line)
+    elif path.endswith('.jsonl'):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from json.load(f)
+
+def screen_stream(articles, criteria, cache=None, stats=None):
+    # Yields one result row per article, as the articles arrive
+    if stats:
+        evaluate = lambda title, abstract: stats.evaluate(criteria, title, abstract)
+    else:
+        evaluate = cache.evaluate if cache else criteria.evaluate
+    for art in articles:
+        decision, reason = evaluate(art.get('title', ''), art.get('abstract', ''))
+
+        yield {
             "Key": art['key'],
             "Title": art['title'],
             "Decision": decision,
             "Reason": reason
-        })
-    
-    return results
+        }
+
+def _init_worker(criteria_path, cache_path=None, stats=False):
+    # Each worker compiles the criteria once and reuses them for all of its chunks.
+    # It only reads the cache; the new entries go back to the parent to be written.
+    global _criteria, _cache, _stats
+    _criteria = Criteria.load(criteria_path)
+    _cache = ScreeningCache(cache_path, _criteria, readonly=True) if cache_path else None
+    _stats = ScreeningStats(len(_criteria.rules)) if stats else None
+
+def _screen_chunk(chunk):
+    global _stats
+    rows = list(screen_stream(chunk, _criteria, _cache, _stats))
+    cached = chunk_stats = None
+    if _cache is not None:
+        counts = (_cache.reused, _cache.changed, _cache.screened)
+        _cache.reused = _cache.changed = _cache.screened = 0
+        cached = (_cache.take_pending(), counts)
+    if _stats is not None:
+        chunk_stats, _stats = _stats, ScreeningStats(len(_criteria.rules))
+    return rows, cached, chunk_stats
+
+def chunked(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def screen_parallel(articles, criteria_path, workers, chunk_size=CHUNK_SIZE, cache=None, stats=None):
+    # Screens chunks of articles on a process pool and yields the rows in input
+    # order. Only a few chunks per worker are in flight, so streamed input
+    # still runs in bounded memory.
+    def collect(future):
+        rows, cached, chunk_stats = future.result()
+        if chunk_stats:
+            stats.merge(chunk_stats)
+        if cached:
+            entries, (reused, changed, screened) = cached
+            cache.store(entries)
+            cache.reused += reused
+            cache.changed += changed
+            cache.screened += screened
+        return rows
+
+    if cache:
+        cache.flush()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(criteria_path, cache.path if cache else None, stats is not None)) as pool:
+        pending = deque()
+        for chunk in chunked(articles, chunk_size):
+            pending.append(pool.submit(_screen_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield from collect(pending.popleft())
+        while pending:
+            yield from collect(pending.popleft())
+
+def screen_articles(json_path, criteria_path=CRITERIA_FILE):
+    # The criteria are compiled once and applied to every article
+    criteria = Criteria.load(criteria_path)
+    return list(screen_stream(read_articles(json_path), criteria))
+
+def write_results(rows, out, log):
+    writer = csv.DictWriter(out, fieldnames=FIELDNAMES)
+    writer.writeheader()
+    for res in rows:
+        writer.writerow(res)
+        print(f"[{res['Decision']}] {res['Title'][:50]}... - {res['Reason']}", file=log)
 
 if __name__ == "__main__":
-    results = screen_articles('parsed_articles.json')
-    with open('screening_results.csv', 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=["Key", "Title", "Decision", "Reason"])
-        writer.writeheader()
-        writer.writerows(results)
-    
-    print("Screening complete. Results saved to screening_results.csv")
-    for res in results:
-        print(f"[{res['Decision']}] {res['Title'][:50]}... - {res['Reason']}")
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--criteria", default=CRITERIA_FILE,
+                        help="Screening criteria file (keyword groups and inclusion/exclusion rules)")
+    parser.add_argument("--input", default=INPUT_FILE,
+                        help="Parsed articles: JSON array, .jsonl file, or '-' for JSON Lines on stdin")
+    parser.add_argument("--output", default=OUTPUT_FILE,
+                        help="Results CSV, or '-' for stdout")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Screen chunks of articles on N processes (same output as a single process)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help="Articles per chunk with --workers")
+    parser.add_argument("--cache", nargs="?", const=CACHE_FILE, default=None, metavar="PATH",
+                        help=f"Keep decisions in a cache (default {CACHE_FILE}) and only screen new, "
+                             "changed or rule-affected articles on reruns")
+    parser.add_argument("--stats", action="store_true",
+                        help="Count group hits, exclusion reasons and per-rule time, and write them "
+                             "to <output>_stats.json")
+    args = parser.parse_args()
+
+    log = sys.stderr if args.output == '-' else sys.stdout
+    criteria = Criteria.load(args.criteria)
+    stats = ScreeningStats(len(criteria.rules)) if args.stats else None
+    if args.cache and stats:
+        print("--stats screens every article, so the cache is not used", file=log)
+    cache = ScreeningCache(args.cache, criteria) if args.cache and not stats else None
+    start = time.perf_counter()
+    if args.workers > 1:
+        rows = screen_parallel(read_articles(args.input), args.criteria, args.workers, args.chunk_size, cache, stats)
+    else:
+        rows = screen_stream(read_articles(args.input), criteria, cache, stats)
+    # Rows are written as they are screened, so JSON Lines input runs in constant memory
+    if args.output == '-':
+        sys.stdout.reconfigure(encoding='utf-8', newline='')
+        write_results(rows, sys.stdout, sys.stderr)
+        print("Screening complete.", file=sys.stderr)
+    else:
+        with open(args.output, 'w', newline='', encoding='utf-8') as f:
+            write_results(rows, f, sys.stdout)
+        print(f"Screening complete. Results saved to {args.output}")
+    if cache:
+        cache.close()
+        print(f"Cache {args.cache}: {cache.reused} decisions reused, {cache.changed} re-screened "
+              f"after a criteria change, {cache.screened} new or changed articles screened", file=log)
+    if stats:
+        summary = stats.summary(criteria, time.perf_counter() - start)
+        summary['criteria'] = args.criteria
+        stats_path = (os.path.splitext(args.output)[0] if args.output != '-' else 'screening') + '_stats.json'
+        write_summary(summary, stats_path)
+        print_summary(summary, log)
+        print(f"Statistics saved to {stats_path}", file=log)
@@ -0,0 +1,110 @@
+import json
+import hashlib
+import sqlite3
+
+# Persistent cache of screening decisions, so a rerun only screens what changed.
+#
+# Each article is keyed by a hash of its normalised (uppercased, as the matcher
+# sees it) title and abstract. Next to its decision the cache keeps a hash of
+# the rules (flags, exclusion rules, include reason and group names) and a hash
+# of every keyword group the decision actually looked at. Evaluation is
+# deterministic, so a cached decision still holds as long as the rules are the
+# same and none of those groups changed: editing one keyword only re-screens
+# the articles whose decision depended on that group, and a changed
+# title/abstract or a new record is screened as usual.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS decisions (
+    text_hash BLOB PRIMARY KEY,
+    rules_hash BLOB,
+    group_hashes BLOB,
+    decision TEXT,
+    reason TEXT
+) WITHOUT ROWID;
+"""
+GROUP_HASH_SIZE = 8
+BATCH_SIZE = 5000
+
+
+def _digest(text, size=16):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=size).digest()
+
+
+def text_hash(title, abstract):
+    return _digest((title or "").strip().upper() + '\0' + (abstract or "").strip().upper())
+
+
+def rules_hash(spec):
+    # Everything but the keywords themselves, which are hashed per group
+    rules = dict(spec, groups=sorted(spec.get('groups', {})))
+    return _digest(json.dumps(rules, sort_keys=True))
+
+
+def group_hash(name, keywords):
+    # Keyword order does not change what a group matches
+    return _digest(name + '\0' + json.dumps(sorted(set(keywords))), GROUP_HASH_SIZE)
+
+
+class ScreeningCache:
+    def __init__(self, path, criteria, readonly=False):
+        self.path = path
+        self.criteria = criteria
+        self.readonly = readonly
+        if readonly:
+            self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        else:
+            self.conn = sqlite3.connect(path)
+            # Readers (the --workers processes) do not block the writer
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(SCHEMA)
+        self.rules_hash = rules_hash(criteria.spec)
+        self.group_hashes = {name: group_hash(name, keywords) for name, keywords in criteria.groups.items()}
+        self.current = set(self.group_hashes.values())
+        self.pending = []
+        self.reused = self.changed = self.screened = 0
+
+    def close(self):
+        if not self.readonly:
+            self.flush()
+        self.conn.close()
+
+    def is_current(self, rules, groups):
+        if rules != self.rules_hash:
+            return False
+        return all(groups[i:i + GROUP_HASH_SIZE] in self.current
+                   for i in range(0, len(groups), GROUP_HASH_SIZE))
+
+    def evaluate(self, title, abstract):
+        # Same (decision, reason) as criteria.evaluate, from the cache where possible
+        h = text_hash(title, abstract)
+        row = self.conn.execute("SELECT rules_hash, group_hashes, decision, reason FROM decisions "
+                                "WHERE text_hash = ?", (h,)).fetchone()
+        if row and self.is_current(row[0], row[1]):
+            self.reused += 1
+            return row[2], row[3]
+        if row:
+            self.changed += 1
+        else:
+            self.screened += 1
+
+        hits = {}
+        decision, reason = self.criteria.evaluate(title, abstract, hits)
+        groups = b''.join(sorted({self.group_hashes[name] for _, name in hits}))
+        self.pending.append((h, self.rules_hash, groups, decision, reason))
+        if not self.readonly and len(self.pending) >= BATCH_SIZE:
+            self.flush()
+        return decision, reason
+
+    def take_pending(self):
+        # New entries collected by a read-only (worker) cache, for the writer to store
+        pending, self.pending = self.pending, []
+        return pending
+
+    def store(self, entries):
+        self.pending.extend(entries)
+        if len(self.pending) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        self.conn.executemany("INSERT OR REPLACE INTO decisions VALUES (?, ?, ?, ?, ?)", self.take_pending())
+        self.conn.commit()
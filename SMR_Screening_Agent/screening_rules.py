@@ -0,0 +1,213 @@
+import re
+import json
+
+from keyword_matcher import KeywordMatcher
+
+# Screening criteria compiled from a JSON file (see criteria.json).
+#
+#   groups:  {name: [keywords]}        keyword syntax as in keyword_matcher.py
+#   flags:   {name: expression}        or {"if": expression, "except": expression}
+#   exclude: [{"if" | "unless": expression, "except": expression, "reason": text}]
+#   include: {"reason": text}
+#
+# Expressions combine atoms with and / or / not and parentheses. An atom is
+# title:group, abstract:group or any:group (title or abstract), or a flag name.
+# Exclusion rules are tried in order and the first one that fires gives the
+# reason; an article that passes them all is included.
+#
+# Everything is compiled once into nested closures. Evaluation short-circuits
+# and each group is searched at most once per text, so an article only pays
+# for the keyword groups its decision actually depends on.
+
+INCLUDE, EXCLUDE = "Include", "Exclude"
+SCOPES = ("title", "abstract", "any")
+
+TOKEN = re.compile(r'\s*(?:(\()|(\))|(\w+:\w+|\w+))')
+
+
+def tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.strip()
+    while pos < len(text):
+        m = TOKEN.match(text, pos)
+        if not m:
+            raise ValueError(f"Invalid expression near {text[pos:]!r}")
+        tokens.append(m.group(m.lastindex))
+        pos = m.end()
+    return tokens
+
+
+class _Parser:
+    # expr := term ("or" term)*;  term := factor ("and" factor)*;
+    # factor := "not" factor | "(" expr ")" | atom
+    def __init__(self, text, compile_atom):
+        self.text = text
+        self.tokens = tokenize(text)
+        self.pos = 0
+        self.compile_atom = compile_atom
+
+    def parse(self):
+        fn = self.expr()
+        if self.pos != len(self.tokens):
+            raise ValueError(f"Unexpected {self.tokens[self.pos]!r} in {self.text!r}")
+        return fn
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self):
+        token = self.peek()
+        if token is None:
+            raise ValueError(f"Unexpected end of {self.text!r}")
+        self.pos += 1
+        return token
+
+    def expr(self):
+        parts = [self.term()]
+        while self.peek() == "or":
+            self.take()
+            parts.append(self.term())
+        if len(parts) == 1:
+            return parts[0]
+        if len(parts) == 2:
+            a, b = parts
+            return lambda ctx: a(ctx) or b(ctx)
+        return lambda ctx: any(p(ctx) for p in parts)
+
+    def term(self):
+        parts = [self.factor()]
+        while self.peek() == "and":
+            self.take()
+            parts.append(self.factor())
+        if len(parts) == 1:
+            return parts[0]
+        if len(parts) == 2:
+            a, b = parts
+            return lambda ctx: a(ctx) and b(ctx)
+        return lambda ctx: all(p(ctx) for p in parts)
+
+    def factor(self):
+        token = self.take()
+        if token == "not":
+            inner = self.factor()
+            return lambda ctx: not inner(ctx)
+        if token == "(":
+            inner = self.expr()
+            if self.take() != ")":
+                raise ValueError(f"Missing ')' in {self.text!r}")
+            return inner
+        if token in ("and", "or", ")"):
+            raise ValueError(f"Unexpected {token!r} in {self.text!r}")
+        return self.compile_atom(token)
+
+
+class _Article:
+    # Per-article evaluation state: uppercased texts plus memoized group and flag results
+    __slots__ = ('texts', 'hits', 'flags')
+
+    def __init__(self, title, abstract, hits=None):
+        self.texts = {'title': title.upper(), 'abstract': abstract.upper()}
+        self.hits = {} if hits is None else hits
+        self.flags = {}
+
+
+class Criteria:
+    def __init__(self, spec):
+        self.spec = spec
+        self.groups = {name: list(keywords) for name, keywords in spec.get('groups', {}).items()}
+        self.matcher = KeywordMatcher(self.groups)
+        self._flag_specs = dict(spec.get('flags', {}))
+        self._flags = {}
+        self._compiling = set()
+        for name in self._flag_specs:
+            self._compile_flag(name)
+
+        self.rules = []
+        for rule in spec.get('exclude', []):
+            if ('if' in rule) == ('unless' in rule):
+                raise ValueError(f"Exclusion rule needs exactly one of 'if'/'unless': {rule}")
+            if 'reason' not in rule:
+                raise ValueError(f"Exclusion rule without a reason: {rule}")
+            fires = self._compile_condition(rule.get('if', rule.get('unless')), rule.get('except'))
+            if 'unless' in rule:
+                fires = self._negate(fires)
+            self.rules.append((fires, rule['reason']))
+        self.include_reason = spec.get('include', {}).get('reason', "")
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    @staticmethod
+    def _negate(fn):
+        return lambda ctx: not fn(ctx)
+
+    def _compile_condition(self, expression, exception=None):
+        fn = _Parser(expression, self._compile_atom).parse()
+        if exception is None:
+            return fn
+        unless = _Parser(exception, self._compile_atom).parse()
+        return lambda ctx: fn(ctx) and not unless(ctx)
+
+    def _compile_flag(self, name):
+        if name in self._flags:
+            return self._flags[name]
+        if name in self._compiling:
+            raise ValueError(f"Flag {name!r} refers to itself")
+        self._compiling.add(name)
+        spec = self._flag_specs[name]
+        if isinstance(spec, str):
+            fn = self._compile_condition(spec)
+        else:
+            fn = self._compile_condition(spec['if'], spec.get('except'))
+
+        def flag(ctx):
+            value = ctx.flags.get(name)
+            if value is None:
+                value = ctx.flags[name] = fn(ctx)
+            return value
+
+        self._compiling.discard(name)
+        self._flags[name] = flag
+        return flag
+
+    def _compile_atom(self, token):
+        if ':' not in token:
+            if token not in self._flag_specs:
+                raise ValueError(f"Unknown flag {token!r}")
+            return self._compile_flag(token)
+        scope, group = token.split(':', 1)
+        if scope not in SCOPES:
+            raise ValueError(f"Unknown scope {scope!r} in {token!r} (use title, abstract or any)")
+        if group not in self.groups:
+            raise ValueError(f"Unknown keyword group {group!r} in {token!r}")
+        if scope == "any":
+            title, abstract = self._hit("title", group), self._hit("abstract", group)
+            return lambda ctx: title(ctx) or abstract(ctx)
+        return self._hit(scope, group)
+
+    def _hit(self, scope, group):
+        key = (scope, group)
+        has = self.matcher.has
+
+        def hit(ctx):
+            value = ctx.hits.get(key)
+            if value is None:
+                value = ctx.hits[key] = has(ctx.texts[scope], group)
+            return value
+        return hit
+
+    def context(self, title, abstract, hits=None):
+        # Evaluation state for one article; the rules are called as fires(ctx)
+        return _Article(title or "", abstract or "", hits)
+
+    def evaluate(self, title, abstract, hits=None):
+        # Returns (decision, reason). hits, if given, is a {(scope, group): bool}
+        # dict of known group results; the groups searched here are added to it.
+        ctx = self.context(title, abstract, hits)
+        for fires, reason in self.rules:
+            if fires(ctx):
+                return EXCLUDE, reason
+        return INCLUDE, self.include_reason
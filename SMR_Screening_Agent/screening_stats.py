@@ -0,0 +1,108 @@
+import json
+import time
+from collections import Counter
+
+from screening_rules import INCLUDE, EXCLUDE, SCOPES
+
+# Instrumented screening for tuning the criteria (screen_articles.py --stats).
+#
+# Every exclusion rule is timed separately; a rule's time includes the keyword
+# groups it is the first to search for an article. Group hit counts are kept
+# per scope, next to how often the group was searched at all: the evaluation
+# is lazy, so a group that only a late rule looks at is not searched for
+# articles an earlier rule already excluded.
+
+
+class ScreeningStats:
+    def __init__(self, n_rules):
+        self.articles = 0
+        self.seconds = 0.0
+        self.decisions = Counter()
+        self.reasons = Counter()
+        self.searched = Counter()
+        self.hits = Counter()
+        self.rule_evaluated = [0] * n_rules
+        self.rule_fired = [0] * n_rules
+        self.rule_seconds = [0.0] * n_rules
+
+    def evaluate(self, criteria, title, abstract):
+        # Same (decision, reason) as criteria.evaluate, with the counters updated
+        start = time.perf_counter()
+        ctx = criteria.context(title, abstract)
+        decision, reason = INCLUDE, criteria.include_reason
+        for n, (fires, rule_reason) in enumerate(criteria.rules):
+            rule_start = time.perf_counter()
+            fired = fires(ctx)
+            self.rule_seconds[n] += time.perf_counter() - rule_start
+            self.rule_evaluated[n] += 1
+            if fired:
+                self.rule_fired[n] += 1
+                decision, reason = EXCLUDE, rule_reason
+                break
+        self.seconds += time.perf_counter() - start
+
+        self.articles += 1
+        self.decisions[decision] += 1
+        self.reasons[reason] += 1
+        for key, hit in ctx.hits.items():
+            self.searched[key] += 1
+            if hit:
+                self.hits[key] += 1
+        return decision, reason
+
+    def merge(self, other):
+        # Adds the counts of another run, e.g. one --workers chunk
+        self.articles += other.articles
+        self.seconds += other.seconds
+        for mine, theirs in [(self.decisions, other.decisions), (self.reasons, other.reasons),
+                             (self.searched, other.searched), (self.hits, other.hits)]:
+            mine.update(theirs)
+        for mine, theirs in [(self.rule_evaluated, other.rule_evaluated), (self.rule_fired, other.rule_fired),
+                             (self.rule_seconds, other.rule_seconds)]:
+            for n, value in enumerate(theirs):
+                mine[n] += value
+
+    def summary(self, criteria, wall_seconds):
+        groups = {}
+        for name in criteria.groups:
+            groups[name] = {scope: {'searched': self.searched[(scope, name)], 'hits': self.hits[(scope, name)]}
+                            for scope in SCOPES if scope != "any"}
+        rules = []
+        for n, (_, reason) in enumerate(criteria.rules):
+            evaluated = self.rule_evaluated[n]
+            rules.append({
+                'rule': n + 1,
+                'reason': reason,
+                'evaluated': evaluated,
+                'fired': self.rule_fired[n],
+                'seconds': round(self.rule_seconds[n], 4),
+                'us_per_article': round(1e6 * self.rule_seconds[n] / evaluated, 2) if evaluated else None,
+            })
+        return {
+            'articles': self.articles,
+            'wall_seconds': round(wall_seconds, 3),
+            'articles_per_sec': round(self.articles / wall_seconds) if wall_seconds else None,
+            'evaluation_seconds': round(self.seconds, 3),
+            'decisions': dict(self.decisions),
+            'reasons': dict(self.reasons.most_common()),
+            'groups': groups,
+            'rules': rules,
+        }
+
+
+def write_summary(summary, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+
+
+def print_summary(summary, log):
+    print(f"\n{summary['articles']} articles in {summary['wall_seconds']:.2f} s "
+          f"({summary['articles_per_sec']} articles/sec, {summary['evaluation_seconds']:.2f} s in the rules)", file=log)
+    print(f"{'Rule':<6}{'Evaluated':>10}{'Fired':>10}{'us/article':>12}  Reason", file=log)
+    for r in summary['rules']:
+        us = f"{r['us_per_article']:.1f}" if r['us_per_article'] is not None else "-"
+        print(f"{r['rule']:<6}{r['evaluated']:>10}{r['fired']:>10}{us:>12}  {r['reason']}", file=log)
+    print(f"{'Group':<16}{'Title hits':>16}{'Abstract hits':>18}", file=log)
+    for name, scopes in summary['groups'].items():
+        title, abstract = scopes['title'], scopes['abstract']
+        print(f"{name:<16}{title['hits']:>7} / {title['searched']:<7}{abstract['hits']:>9} / {abstract['searched']:<7}", file=log)